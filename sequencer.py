@@ -19,24 +19,1596 @@
 # <pep8 compliant>
 
 import bpy
+import csv
+import gpu
+import numpy as np
+import functools
+import json
+import math
+import operator
+import os
+import re
+import subprocess
+import sys
 import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from bpy.app.handlers import persistent
 from bpy.types import Operator
-from operator import attrgetter
+from gpu_extras.batch import batch_for_shader
+from operator import attrgetter, itemgetter
+import sequencer_media
+import sequencer_peaks
+import sequencer_timeline
 from bpy.props import (
     IntProperty,
+    FloatProperty,
     BoolProperty,
     EnumProperty,
     StringProperty,
 )
 
 
+class ChannelIndex:
+    """
+    Strips of one sequences collection sorted by start frame per channel.
+
+    Strips on a channel never overlap, so the strip at a frame or the next
+    strip on a channel is found with a binary search on the start frames.
+    """
+    __slots__ = ("channels",)
+
+    def __init__(self, sequences):
+        channels = {}
+        for s in sequences:
+            channels.setdefault(s.channel, []).append((s.frame_final_start, s.frame_final_end, s))
+
+        self.channels = {}
+        for channel, items in channels.items():
+            items.sort(key=itemgetter(0))
+            self.channels[channel] = (
+                [item[0] for item in items],
+                [item[1] for item in items],
+                [item[2] for item in items],
+            )
+
+    def strips(self, channel):
+        """Strips on channel, sorted by start frame"""
+        entry = self.channels.get(channel)
+        return entry[2] if entry else []
+
+    def strips_at_frame(self, frame, include_end=False):
+        """Strips covering frame, also the ones ending on it when include_end is set"""
+        found = []
+        for starts, ends, strips in self.channels.values():
+            i = bisect_right(starts, frame) - 1
+            if i < 0:
+                continue
+            if frame < ends[i] or (include_end and frame == ends[i]):
+                found.append(strips[i])
+            if include_end and i > 0 and ends[i - 1] == frame:
+                found.append(strips[i - 1])
+        return found
+
+    def next_strip(self, channel, frame):
+        """First strip on channel starting at or after frame, None if there is none"""
+        entry = self.channels.get(channel)
+        if entry is None:
+            return None
+        starts, _ends, strips = entry
+        i = bisect_left(starts, frame)
+        return strips[i] if i < len(strips) else None
+
+
+def has_inputs(strip):
+    """True for effect strips which follow the strips they read from"""
+    return getattr(strip, "input_count", 0) > 0
+
+
+_index_cache = {}
+_flag_cache = {}
+
+
+def sequences_owner(context):
+    """The sequence editor or the meta strip being edited"""
+    ed = context.scene.sequence_editor
+    return ed.meta_stack[-1] if ed.meta_stack else ed
+
+
+def _fingerprint(sequences):
+    """
+    What the cached indices depend on: which strips there are, where they
+    are and their flags. Comparing it is much cheaper than a rebuild.
+    """
+    return [(s.as_pointer(), s.name, s.channel, s.frame_final_start, s.frame_final_end, s.lock, s.mute)
+            for s in sequences]
+
+
+def _level_cached(context, cache, build):
+    owner = sequences_owner(context)
+    sequences = owner.sequences
+    key = owner.as_pointer()
+    fingerprint = _fingerprint(sequences)
+
+    cached = cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    if not (_index_cache or _flag_cache):
+        for handlers in (
+                bpy.app.handlers.depsgraph_update_post,
+                bpy.app.handlers.undo_post,
+                bpy.app.handlers.redo_post,
+                bpy.app.handlers.load_post,
+        ):
+            if invalidate_caches not in handlers:
+                handlers.append(invalidate_caches)
+
+    value = build(sequences)
+    cache[key] = (fingerprint, value)
+    return value
+
+
+def channel_index(context):
+    """
+    Return the ChannelIndex of the strips being edited, built on first use.
+
+    The index is dropped on depsgraph updates, undo and file load, and by
+    the edit functions of this module. The strips are compared with the
+    ones it was built from as well, so an index holding removed strips is
+    never used when a script edits strips between two operator calls.
+    """
+    return _level_cached(context, _index_cache, ChannelIndex)
+
+
+@persistent
+def invalidate_caches(*args):
+    """Drop all cached strip indices, used as handler as well"""
+    _index_cache.clear()
+    _flag_cache.clear()
+
+
+def timeline_model(context):
+    """Snapshot the strips being edited into a sequencer_timeline.Timeline"""
+    return sequencer_timeline.Timeline.from_sequences(sequences_owner(context).sequences)
+
+
+def ripple_delete(context, strips):
+    """
+    Delete strips together with the effects depending on them and close the
+    gaps left by strips, with one delete call.
+    """
+    removed = {}
+    for s in strips:
+        removed.setdefault(s.channel, []).append((s.frame_final_start, s.frame_final_end))
+
+    timeline = timeline_model(context)
+    names = [s.name for s in strips]
+    effects = timeline.dependents_of(names)
+
+    sequences = sequences_owner(context).sequences
+    bpy.ops.sequencer.select_all(action='DESELECT')
+    for s in strips:
+        s.select = True
+    for name in effects:
+        sequences[name].select = True
+    bpy.ops.sequencer.delete()
+
+    timeline.remove(effects.union(names))
+    sequencer_timeline.ripple_shift(timeline, removed)
+    timeline.apply()
+    invalidate_caches()
+
+
+def lift_strips(context, strips):
+    """Delete strips with one delete call, leaving their frames empty"""
+    if not strips:
+        return
+    bpy.ops.sequencer.select_all(action='DESELECT')
+    for s in strips:
+        s.select = True
+    bpy.ops.sequencer.delete()
+    invalidate_caches()
+
+
+def close_gaps(context, strips):
+    """
+    Close the gap after each strip by moving the strips behind it on its
+    channel, works at the meta level being edited. Returns the strips a gap
+    was closed for.
+    """
+    timeline = timeline_model(context)
+    closed = set(sequencer_timeline.close_gaps(timeline, [s.name for s in strips]))
+    timeline.apply()
+    invalidate_caches()
+    return [s for s in strips if s.name in closed]
+
+
+def crossfade_pairs(strips):
+    """
+    Strips paired with the strip they overlap at their start, the one of
+    the earlier strips ending last. Strips ending inside that strip are
+    left out, fading it to silence there would mute the rest of it.
+    """
+    pairs = []
+    current = None
+    for s in sorted(strips, key=attrgetter('frame_final_start', 'frame_final_end')):
+        if current is not None and s.frame_final_start < current.frame_final_end:
+            if s.frame_final_end <= current.frame_final_end:
+                continue
+            pairs.append((current, s))
+        current = s
+    return pairs
+
+
+def crossfade_sounds(scene, pairs, curve='SMOOTH', steps=8):
+    """
+    Fade the first strip of every pair out and the second one in over their
+    overlap. The volume keyframes are written into the F-curves of the scene
+    action directly, so the current frame never changes.
+    """
+    anim = scene.animation_data or scene.animation_data_create()
+    if anim.action is None:
+        anim.action = bpy.data.actions.new(scene.name + "Action")
+    fcurves = anim.action.fcurves
+    volume_curves = {}
+
+    def volume_curve(strip):
+        data_path = strip.path_from_id("volume")
+        fcurve = volume_curves.get(data_path)
+        if fcurve is None:
+            fcurve = fcurves.find(data_path) or fcurves.new(data_path, action_group=strip.name)
+            volume_curves[data_path] = fcurve
+        return fcurve
+
+    def volume_at(fcurve, strip, frame):
+        return fcurve.evaluate(frame) if len(fcurve.keyframe_points) else strip.volume
+
+    def insert(fcurve, frame, value, interpolation):
+        fcurve.keyframe_points.insert(frame, value, options={'FAST'}).interpolation = interpolation
+
+    for s1, s2 in pairs:
+        fade_start = s2.frame_final_start
+        fade_end = min(s1.frame_final_end, s2.frame_final_end)
+        out_curve = volume_curve(s1)
+        in_curve = volume_curve(s2)
+        out_volume = volume_at(out_curve, s1, fade_start)
+        in_volume = volume_at(in_curve, s2, fade_end)
+
+        if curve == 'EQUAL_POWER':
+            for i in range(steps + 1):
+                factor = i / steps
+                frame = fade_start + (fade_end - fade_start) * factor
+                insert(out_curve, frame, out_volume * math.cos(factor * math.pi / 2), 'LINEAR')
+                insert(in_curve, frame, in_volume * math.sin(factor * math.pi / 2), 'LINEAR')
+        else:
+            interpolation = 'LINEAR' if curve == 'LINEAR' else 'BEZIER'
+            insert(out_curve, fade_start, out_volume, interpolation)
+            insert(out_curve, fade_end, 0.0, interpolation)
+            insert(in_curve, fade_start, 0.0, interpolation)
+            insert(in_curve, fade_end, in_volume, interpolation)
+
+    for fcurve in volume_curves.values():
+        fcurve.update()
+
+
+def cut_multicam(context, strip, cuts):
+    """
+    Cut a multicam strip at every (frame, camera) of cuts and switch the part
+    starting there to camera, in one pass over the sorted cuts.
+
+    Cuts outside the strip, to cameras not below it or to the camera already
+    playing are skipped. The parts are cut off with the cut operator, so they
+    keep the modifiers, settings and animation of strip. Returns the parts in
+    time order, the first one being strip itself.
+    """
+    start = strip.frame_final_start
+    end = strip.frame_final_end
+
+    parts = [[start, strip.multicam_source]]
+    for frame, camera in sorted(cuts, key=itemgetter(0)):
+        if not (start <= frame < end and 1 <= camera < strip.channel):
+            continue
+        if frame == parts[-1][0]:
+            parts[-1][1] = camera
+            if len(parts) > 1 and parts[-2][1] == camera:
+                parts.pop()
+        elif camera != parts[-1][1]:
+            parts.append([frame, camera])
+
+    strip.multicam_source = parts[0][1]
+    result = [strip]
+    if len(parts) == 1:
+        return result
+
+    # Cut from the end, so strip stays the part left of every cut. Only the
+    # part cut off last is selected after a cut, so the selection is cleared
+    # just once.
+    bpy.ops.sequencer.select_all(action='DESELECT')
+    part = None
+    for frame, camera in reversed(parts[1:]):
+        if part is not None:
+            part.select = False
+        strip.select = True
+        bpy.ops.sequencer.cut(frame=frame, type='SOFT', side='RIGHT')
+        part = context.selected_sequences[0]
+        part.multicam_source = camera
+        result.insert(1, part)
+
+    invalidate_caches()
+    return result
+
+
+def multicam_cuts_from_markers(scene):
+    """(frame, camera) of every timeline marker whose name ends in a camera number, like Cam 2"""
+    cuts = []
+    for marker in scene.timeline_markers:
+        match = re.search(r"(\d+)\s*$", marker.name)
+        if match:
+            cuts.append((marker.frame, int(match.group(1))))
+    return cuts
+
+
+def multicam_cuts_from_csv(filepath):
+    """(frame, camera) of every CSV row starting with a frame and a camera number, other rows are skipped"""
+    cuts = []
+    with open(filepath, newline='') as csv_file:
+        for row in csv.reader(csv_file):
+            try:
+                cuts.append((int(row[0]), int(row[1])))
+            except (IndexError, ValueError):
+                continue
+    return cuts
+
+
+def move_strips(context, strips, frame_delta=0, channel_delta=0):
+    """
+    Move strips together by frame_delta frames or channel_delta channels,
+    see sequencer_timeline.move_strips. Only the strips which moved are
+    written back. Returns the applied (frame_delta, channel_delta).
+    """
+    timeline = timeline_model(context)
+    applied = sequencer_timeline.move_strips(
+        timeline, [s.name for s in strips], frame_delta=frame_delta, channel_delta=channel_delta)
+    if timeline.apply():
+        invalidate_caches()
+    return applied
+
+
+def edit_point_distance(context, strips, forward):
+    """
+    Frames from the first start or last end of strips to the nearest start
+    or end of the other strips in the move direction, 0 when there is none.
+    """
+    return sequencer_timeline.edit_point_distance(timeline_model(context), [s.name for s in strips], forward)
+
+
+_image_settings = (
+    "blend_type", "blend_alpha", "mute", "color_saturation", "color_multiply",
+    "use_flip_x", "use_flip_y", "use_reverse_frames", "use_float", "alpha_mode",
+)
+
+# Settings copied to match frame copies, by strip type.
+_match_frame_attributes = {
+    'MOVIE': _image_settings + ("use_deinterlace", "stream_index"),
+    'IMAGE': _image_settings + ("use_deinterlace",),
+    'SCENE': _image_settings + ("volume", "use_sequence", "scene_camera"),
+    'MOVIECLIP': _image_settings,
+    'MASK': _image_settings,
+    'SOUND': ("mute", "volume", "pan", "pitch"),
+}
+
+
+def match_frame_copy(sequences, seq, channel):
+    """
+    Add the full source of seq on channel, starting at the frame its source
+    starts, through the sequences data API. Returns None for strips without
+    a source, such as meta strips or generated effects. Raises RuntimeError
+    when the media can't be opened, like offline or packed files.
+
+    The copies keep the relative paths of seq, sound copies use the sound
+    datablock of seq.
+    """
+    frame_start = seq.frame_start
+    stype = seq.type
+
+    if stype == 'MOVIE':
+        copy = sequences.new_movie(seq.name, bpy.path.abspath(seq.filepath), channel, frame_start)
+        copy.filepath = seq.filepath
+    elif stype == 'IMAGE':
+        elements = seq.elements
+        filepath = os.path.join(bpy.path.abspath(seq.directory), elements[0].filename)
+        copy = sequences.new_image(seq.name, filepath, channel, frame_start)
+        copy.directory = seq.directory
+        for elem in elements[1:]:
+            copy.elements.append(elem.filename)
+    elif stype == 'SOUND' and seq.sound:
+        if seq.sound.packed_file:
+            raise RuntimeError("Packed sound " + seq.sound.name)
+        copy = sequences.new_sound(seq.name, bpy.path.abspath(seq.sound.filepath), channel, frame_start)
+        added = copy.sound
+        if added != seq.sound:
+            copy.sound = seq.sound
+            if added.users == 0:
+                bpy.data.sounds.remove(added)
+    elif stype == 'SCENE' and seq.scene:
+        copy = sequences.new_scene(seq.name, seq.scene, channel, frame_start)
+    elif stype == 'MOVIECLIP' and seq.clip:
+        copy = sequences.new_clip(seq.name, seq.clip, channel, frame_start)
+    elif stype == 'MASK' and seq.mask:
+        copy = sequences.new_mask(seq.name, seq.mask, channel, frame_start)
+    else:
+        return None
+
+    for attr in _match_frame_attributes[stype]:
+        if hasattr(seq, attr):
+            setattr(copy, attr, getattr(seq, attr))
+    if hasattr(seq, "colorspace_settings"):
+        copy.colorspace_settings.name = seq.colorspace_settings.name
+
+    return copy
+
+
+def split_strips(context, strips, frame, split_type='SOFT'):
+    """
+    Split strips at frame with a single cut call.
+
+    Returns the new strips right of the cut, found on the channels of the
+    split strips, so callers can select them without scanning all strips.
+    """
+    strips = [s for s in strips if s.frame_final_start < frame < s.frame_final_end]
+    if not strips:
+        return []
+
+    bpy.ops.sequencer.select_all(action='DESELECT')
+    for s in strips:
+        s.select = True
+    bpy.ops.sequencer.cut(frame=frame, type=split_type, side='BOTH')
+    invalidate_caches()
+
+    index = channel_index(context)
+    new_strips = []
+    for channel in {s.channel for s in strips}:
+        strip = index.next_strip(channel, frame)
+        if strip is not None and strip.frame_final_start == frame:
+            new_strips.append(strip)
+    return new_strips
+
+
+class FlagIndex:
+    """Strips of one sequences collection with the lock or mute flag set"""
+    __slots__ = ("flags",)
+
+    def __init__(self, sequences):
+        self.flags = {"lock": [], "mute": []}
+        for s in sequences:
+            if s.lock:
+                self.flags["lock"].append(s)
+            if s.mute:
+                self.flags["mute"].append(s)
+
+
+def flag_index(context):
+    """Return the FlagIndex of the strips being edited, cached like channel_index"""
+    return _level_cached(context, _flag_cache, FlagIndex)
+
+
+_query_fields = {
+    "type": attrgetter("type"),
+    "name": attrgetter("name"),
+    "channel": attrgetter("channel"),
+    "start": attrgetter("frame_final_start"),
+    "end": attrgetter("frame_final_end"),
+    "duration": attrgetter("frame_final_duration"),
+    "lock": attrgetter("lock"),
+    "mute": attrgetter("mute"),
+    "select": attrgetter("select"),
+}
+
+# Type of the values each field is compared with, the flags compare with 0 and 1.
+_query_types = {
+    "type": str,
+    "name": str,
+    "channel": int,
+    "start": int,
+    "end": int,
+    "duration": int,
+    "frame": int,
+    "lock": int,
+    "mute": int,
+    "select": int,
+}
+
+_query_operators = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_query_token = re.compile(r"""\s*(?:(-?\d+)|([A-Za-z_]\w*)|"([^"]*)"|'([^']*)'|(==|!=|<=|>=|[<>=(){}\[\],]))""")
+
+
+def _query_tokens(expression):
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _query_token.match(expression, pos)
+        if match is None:
+            raise ValueError("Unexpected %r at position %d" % (expression[pos:pos + 10], pos))
+        number, word, string_1, string_2, symbol = match.groups()
+        if number is not None:
+            tokens.append(("value", int(number)))
+        elif word is not None:
+            tokens.append(("word", word))
+        elif symbol is not None:
+            tokens.append(("symbol", symbol))
+        else:
+            tokens.append(("value", string_1 if string_1 is not None else string_2))
+        pos = match.end()
+    return tokens
+
+
+class _QueryParser:
+    # Recursive descent parser turning the token list into nested tuples:
+    # ('or', [...]), ('and', [...]), ('not', node), ('flag', field),
+    # ('cmp', field, op, value), ('in_set', field, values) and
+    # ('in_range', field, low, high).
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValueError("Expected %s, got %s" % (value or kind, token[1] or "end of expression"))
+        self.pos += 1
+        return token[1]
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ValueError("Unexpected %r" % (self.peek()[1],))
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ("word", "or"):
+            self.pos += 1
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == ("word", "and"):
+            self.pos += 1
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == ("word", "not"):
+            self.pos += 1
+            return ("not", self.parse_not())
+        return self.parse_atom()
+
+    def parse_value(self, field):
+        kind, value = self.peek()
+        self.pos += 1
+        if kind == "word":
+            # Bare words are enum items, like MOVIE in "type == movie".
+            return self.check_value(field, value, value.upper())
+        if kind == "value":
+            return self.check_value(field, value, value)
+        raise ValueError("Expected a value for %s" % field)
+
+    @staticmethod
+    def check_value(field, text, value):
+        if not isinstance(value, _query_types[field]):
+            kind = "a number" if _query_types[field] is int else "a name or text"
+            raise ValueError("%s needs %s, not %r" % (field, kind, text))
+        return value
+
+    def parse_atom(self):
+        if self.peek() == ("symbol", "("):
+            self.pos += 1
+            node = self.parse_or()
+            self.take("symbol", ")")
+            return node
+
+        field = self.take("word")
+        if field not in _query_fields and field != "frame":
+            raise ValueError("Unknown field %r" % field)
+
+        kind, value = self.peek()
+        if kind == "symbol" and value in _query_operators:
+            self.pos += 1
+            if field == "frame" and value not in {"==", "="}:
+                raise ValueError("frame only supports == and in [first, last]")
+            return ("cmp", field, value, self.parse_value(field))
+
+        if (kind, value) == ("word", "in"):
+            self.pos += 1
+            if self.peek() == ("symbol", "["):
+                self.pos += 1
+                low = self.take("value")
+                self.check_value(field, low, low)
+                self.take("symbol", ",")
+                high = self.take("value")
+                self.check_value(field, high, high)
+                self.take("symbol", "]")
+                return ("in_range", field, low, high)
+            self.take("symbol", "{")
+            values = [self.parse_value(field)]
+            while self.peek() == ("symbol", ","):
+                self.pos += 1
+                values.append(self.parse_value(field))
+            self.take("symbol", "}")
+            return ("in_set", field, frozenset(values))
+
+        if field in {"lock", "mute", "select"}:
+            return ("flag", field)
+        raise ValueError("Expected a comparison after %r" % field)
+
+
+def _query_predicate(node):
+    kind = node[0]
+    if kind == "or":
+        parts = [_query_predicate(n) for n in node[1]]
+        return lambda s: any(part(s) for part in parts)
+    if kind == "and":
+        parts = [_query_predicate(n) for n in node[1]]
+        return lambda s: all(part(s) for part in parts)
+    if kind == "not":
+        part = _query_predicate(node[1])
+        return lambda s: not part(s)
+    if kind == "flag":
+        return _query_fields[node[1]]
+
+    field = node[1]
+    if field == "frame":
+        if kind == "cmp":
+            frame = node[3]
+            return lambda s: s.frame_final_start <= frame < s.frame_final_end
+        if kind == "in_range":
+            low, high = node[2], node[3]
+            return lambda s: s.frame_final_start <= high and s.frame_final_end > low
+        raise ValueError("frame only supports == and in [first, last]")
+
+    get = _query_fields[field]
+    if kind == "cmp":
+        compare = _query_operators[node[2]]
+        value = node[3]
+        return lambda s: compare(get(s), value)
+    if kind == "in_set":
+        values = node[2]
+        return lambda s: get(s) in values
+    low, high = node[2], node[3]
+    return lambda s: low <= get(s) <= high
+
+
+def _query_plan(node):
+    # Narrow the candidates from the top level "and" terms: channels to look
+    # at, flags every match has, and a frame range every match overlaps.
+    terms = node[1] if node[0] == "and" else [node]
+    channels = set(range(1, 33))
+    flags = []
+    frames = None
+    for term in terms:
+        kind, field = term[0], term[1] if len(term) > 1 else None
+        if kind == "flag" and field in {"lock", "mute"}:
+            flags.append(field)
+        elif field == "channel" and kind != "not":
+            channels = {c for c in channels if _query_predicate(term)(_ChannelProbe(c))}
+        elif field == "frame":
+            low, high = (term[3], term[3]) if kind == "cmp" else (term[2], term[3])
+            if frames is not None:
+                low, high = max(low, frames[0]), min(high, frames[1])
+            frames = (low, high)
+    return channels, flags, frames
+
+
+class _ChannelProbe:
+    # Stand-in strip to evaluate channel terms for a channel number.
+    __slots__ = ("channel",)
+
+    def __init__(self, channel):
+        self.channel = channel
+
+
+@functools.lru_cache(maxsize=64)
+def compile_query(expression):
+    """
+    Compile a strip query to (predicate, plan), cached per expression.
+
+    Queries combine terms with and, or, not and parentheses. Terms are
+    comparisons of type, name, channel, start, end or duration
+    (==, !=, <, <=, >, >=), set tests like "type in {MOVIE, IMAGE}",
+    inclusive ranges like "channel in [2, 4]", "frame == 100" or
+    "frame in [100, 500]" for strips covering a frame or a frame range,
+    and the lock, mute and select flags. Raises ValueError on errors.
+    """
+    node = _QueryParser(_query_tokens(expression)).parse()
+    return _query_predicate(node), _query_plan(node)
+
+
+def query_strips(context, expression):
+    """
+    Strips being edited matching the query expression, see compile_query.
+
+    The candidates come from the flag index when the query requires a flag,
+    otherwise from the channel index, restricted to the channels and frame
+    range the query allows. Only the candidates are tested.
+    """
+    predicate, (channels, flags, frames) = compile_query(expression)
+
+    if flags:
+        candidates = min((flag_index(context).flags[flag] for flag in flags), key=len)
+        candidates = [s for s in candidates if s.channel in channels]
+    else:
+        candidates = []
+        index = channel_index(context)
+        for channel in channels & index.channels.keys():
+            starts, ends, strips = index.channels[channel]
+            if frames is None:
+                candidates.extend(strips)
+                continue
+            low, high = frames
+            i = bisect_right(starts, high)
+            while i > 0 and ends[i - 1] > low:
+                i -= 1
+                candidates.append(strips[i])
+
+    return [s for s in candidates if predicate(s)]
+
+
+def apply_selection(context, strips, mode='SET'):
+    """Replace, add to, subtract from or intersect the selection with strips"""
+    if mode == 'SET':
+        bpy.ops.sequencer.select_all(action='DESELECT')
+        for s in strips:
+            s.select = True
+    elif mode == 'ADD':
+        for s in strips:
+            s.select = True
+    elif mode == 'SUBTRACT':
+        for s in strips:
+            s.select = False
+    elif mode == 'INTERSECT':
+        keep = {s.name for s in strips}
+        for s in context.selected_sequences:
+            if s.name not in keep:
+                s.select = False
+
+
+# Value for bulk_set flipping a boolean property.
+TOGGLE = object()
+
+
+_assignment = re.compile(r"""\s*(\w*)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^,"'=]*?))\s*(?:,|$)""")
+
+
+def parse_assignments(text):
+    """
+    Parse "use_flip_x=toggle, use_deinterlace=true, blend_alpha=0.5" into a
+    dict for bulk_set. Values are true, false, toggle, numbers or strings,
+    quoted strings may contain commas. Raises ValueError on errors.
+    """
+    values = {}
+    text = text.strip()
+    pos = 0
+    while pos < len(text):
+        if text[pos] in ", \t":
+            pos += 1
+            continue
+        match = _assignment.match(text, pos)
+        if match is None or not match.group(1).isidentifier():
+            raise ValueError("Expected property=value, got %r" % text[pos:].split(",")[0].strip())
+        name, quoted_1, quoted_2, value = match.groups()
+        pos = match.end()
+
+        if value is None:
+            values[name] = quoted_1 if quoted_1 is not None else quoted_2
+            continue
+        lower = value.lower()
+        if lower == "toggle":
+            values[name] = TOGGLE
+        elif lower in {"true", "false"}:
+            values[name] = lower == "true"
+        else:
+            try:
+                values[name] = int(value)
+            except ValueError:
+                try:
+                    values[name] = float(value)
+                except ValueError:
+                    values[name] = value
+    return values
+
+
+_assignable_types = {
+    'BOOLEAN': (bool,),
+    'INT': (int,),
+    'FLOAT': (int, float),
+    'STRING': (str,),
+    'ENUM': (str,),
+}
+
+
+def _check_assignment(rna, name, value):
+    # Raise ValueError unless value can be set to the property name of rna.
+    prop = rna.properties[name]
+    if prop.is_readonly:
+        raise ValueError("%s of %s strips is read-only" % (name, rna.name))
+    if value is TOGGLE:
+        if prop.type != 'BOOLEAN':
+            raise ValueError("Only boolean properties can be toggled, not %s" % name)
+        return
+    if getattr(prop, "is_array", False) or getattr(prop, "is_enum_flag", False) or prop.type not in _assignable_types:
+        raise ValueError("%s can't be set from text" % name)
+    if (prop.type == 'INT' and isinstance(value, bool)) or not isinstance(value, _assignable_types[prop.type]):
+        raise ValueError("%s needs a %s value, not %r" % (name, prop.type.lower(), value))
+    if prop.type == 'ENUM' and value not in prop.enum_items.keys():
+        raise ValueError("%s must be one of %s, not %r" % (name, ", ".join(prop.enum_items.keys()), value))
+
+
+def bulk_set(strips, values, types=None):
+    """
+    Set every property in values on the strips in one pass and return the
+    number of strips changed. A value of TOGGLE flips a boolean property.
+    Only strips with a type in types are changed, when types is given, and
+    properties a strip doesn't have are left out for that strip.
+
+    Every assignment is checked against the RNA properties of the strip
+    types first, read-only properties and values of the wrong type raise
+    ValueError before any strip is changed.
+    """
+    strips = [s for s in strips if types is None or s.type in types]
+
+    # The properties to set per strip RNA type, checked once per type.
+    plans = {}
+    for s in strips:
+        rna = s.bl_rna
+        if rna.identifier not in plans:
+            assignments = [(name, value) for name, value in values.items() if name in rna.properties]
+            for name, value in assignments:
+                _check_assignment(rna, name, value)
+            plans[rna.identifier] = assignments
+
+    changed = 0
+    for s in strips:
+        assignments = plans[s.bl_rna.identifier]
+        for name, value in assignments:
+            if value is TOGGLE:
+                value = not getattr(s, name)
+            setattr(s, name, value)
+        changed += bool(assignments)
+    if changed:
+        invalidate_caches()
+    return changed
+
+
+def selected_strips_all(context):
+    """Selected strips of the whole timeline, inside meta strips as well"""
+    return [s for s in context.scene.sequence_editor.sequences_all if s.select]
+
+
+def _strip_states(context):
+    scene = context.scene
+    if not (scene and scene.sequence_editor):
+        return {}
+    return {
+        s.name: (s.channel, s.frame_start, s.frame_final_start, s.frame_final_end, s.select, s.mute, s.lock)
+        for s in scene.sequence_editor.sequences_all
+    }
+
+
+class OperatorProfiler:
+    """
+    Opt-in profiling of the operators of this module.
+
+    While enabled, execute and invoke of the profiled operators are wrapped
+    to record wall time, the bpy.ops calls made inside them, the strips
+    added, removed or changed, and the peak memory allocated from Python.
+    Modal events are not profiled, they would record a run per timer event.
+    Peak memory is left out while tracemalloc was already tracing, so a
+    tracemalloc session of its own is never cut off.
+    """
+    enabled = False
+    runs_kept = 20
+    stats = {}
+
+    _wrapped = []
+    _stack = []
+    _op_call = None
+
+    @classmethod
+    def enable(cls, operator_classes):
+        if cls.enabled:
+            return
+        ops_module = sys.modules["bpy.ops"]
+        cls._op_call = ops_module.op_call
+        ops_module.op_call = cls._counting_op_call
+
+        for op_class in operator_classes:
+            for method in ("execute", "invoke"):
+                function = op_class.__dict__.get(method)
+                if function is not None:
+                    cls._wrapped.append((op_class, method, function))
+                    setattr(op_class, method, cls._profiled(op_class.bl_idname, method, function))
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        if not cls.enabled:
+            return
+        for op_class, method, function in cls._wrapped:
+            setattr(op_class, method, function)
+        cls._wrapped.clear()
+        sys.modules["bpy.ops"].op_call = cls._op_call
+        cls._op_call = None
+        cls.enabled = False
+
+    @classmethod
+    def clear(cls):
+        cls.stats.clear()
+
+    @classmethod
+    def _counting_op_call(cls, idname, *args):
+        for _owner, nested in cls._stack:
+            nested.update((idname,))
+        return cls._op_call(idname, *args)
+
+    @classmethod
+    def _profiled(cls, idname, method, function):
+        def wrapper(self, context, *args):
+            # An invoke calling execute of the same operator is one run.
+            if cls._stack and cls._stack[-1][0] is self:
+                return function(self, context, *args)
+
+            outermost = not cls._stack
+            trace_memory = outermost and not tracemalloc.is_tracing()
+            if outermost:
+                before = _strip_states(context)
+            if trace_memory:
+                tracemalloc.start()
+
+            nested = Counter()
+            cls._stack.append((self, nested))
+            start = time.perf_counter()
+            try:
+                result = function(self, context, *args)
+            except BaseException:
+                if trace_memory:
+                    tracemalloc.stop()
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                cls._stack.pop()
+
+            run = {
+                "method": method,
+                "seconds": seconds,
+                "result": sorted(result),
+                "nested_calls": sum(nested.values()),
+                "nested": dict(nested),
+            }
+            if trace_memory:
+                run["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if outermost:
+                after = _strip_states(context)
+                run["strips_added"] = len(after.keys() - before.keys())
+                run["strips_removed"] = len(before.keys() - after.keys())
+                run["strips_changed"] = sum(
+                    1 for name, state in after.items()
+                    if name in before and before[name] != state
+                )
+            cls._record(idname, run)
+            return result
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    @classmethod
+    def _record(cls, idname, run):
+        stats = cls.stats.get(idname)
+        if stats is None:
+            stats = cls.stats[idname] = {
+                "calls": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "runs": deque(maxlen=cls.runs_kept),
+            }
+        stats["calls"] += 1
+        stats["total_seconds"] += run["seconds"]
+        stats["max_seconds"] = max(stats["max_seconds"], run["seconds"])
+        stats["runs"].append(run)
+
+    @classmethod
+    def as_dict(cls):
+        return {
+            idname: dict(stats, runs=list(stats["runs"]))
+            for idname, stats in cls.stats.items()
+        }
+
+
+def strip_source_path(strip):
+    """Absolute path of the file of a movie strip, or the first file of an image strip"""
+    if strip.type == 'MOVIE':
+        return os.path.normpath(bpy.path.abspath(strip.filepath))
+    return os.path.normpath(os.path.join(bpy.path.abspath(strip.directory), strip.elements[0].filename))
+
+
+def strip_proxy_source(strip):
+    """
+    The source of the proxies of strip for sequencer_media: the file of a
+    movie strip or single image, the list of files of an image sequence.
+    """
+    if strip.type == 'MOVIE' or len(strip.elements) == 1:
+        return strip_source_path(strip)
+    directory = bpy.path.abspath(strip.directory)
+    return [os.path.normpath(os.path.join(directory, e.filename)) for e in strip.elements]
+
+
+def strip_proxy_dir(ed, strip):
+    """Directory Blender writes the proxies of strip to"""
+    if ed.proxy_storage == 'PROJECT':
+        return os.path.normpath(bpy.path.abspath(ed.proxy_dir or "//BL_proxy"))
+    if strip.proxy.use_proxy_custom_directory:
+        return os.path.normpath(bpy.path.abspath(strip.proxy.directory))
+    return os.path.join(os.path.dirname(strip_source_path(strip)), "BL_proxy")
+
+
+def strip_proxy_files(ed, strip, sizes):
+    """
+    The proxy files Blender writes for strip in sizes, of an image strip
+    the ones of its first and last image.
+    """
+    proxy = strip.proxy
+    if strip.type == 'MOVIE' and proxy.use_proxy_custom_file:
+        return [os.path.normpath(bpy.path.abspath(proxy.filepath))]
+    directory = strip_proxy_dir(ed, strip)
+    if strip.type == 'MOVIE':
+        if not proxy.use_proxy_custom_directory or ed.proxy_storage == 'PROJECT':
+            directory = os.path.join(directory, os.path.basename(strip_source_path(strip)))
+        return [os.path.join(directory, "proxy_%d.avi" % size) for size in sizes]
+    names = {strip.elements[0].filename, strip.elements[-1].filename}
+    return [
+        os.path.join(directory, "images", str(size), name + "_proxy.jpg")
+        for size in sizes for name in sorted(names)
+    ]
+
+
+def proxy_settings(strip):
+    """The proxy build settings of strip, as stored in the proxy manifest"""
+    proxy = strip.proxy
+    settings = {
+        "sizes": [size for size in (25, 50, 75, 100) if getattr(proxy, "build_%d" % size)],
+        "quality": proxy.quality,
+    }
+    if strip.type == 'MOVIE':
+        settings["timecode"] = proxy.timecode
+    return settings
+
+
+def _proxy_manifests(ed, strips):
+    # (strip, source, settings, manifest) of strips, one manifest per directory.
+    manifests = {}
+    found = []
+    for s in strips:
+        source = strip_proxy_source(s)
+        directory = strip_proxy_dir(ed, s)
+        manifest = manifests.get(directory)
+        if manifest is None:
+            manifest = manifests[directory] = sequencer_media.ProxyManifest(directory)
+        found.append((s, source, proxy_settings(s), manifest))
+    return found
+
+
+def proxy_strips(ed, selected_only=False):
+    """Movie and image strips using proxies"""
+    return [
+        s for s in ed.sequences_all
+        if s.type in {'MOVIE', 'IMAGE'} and s.use_proxy and s.proxy and (s.select or not selected_only)
+    ]
+
+
+def stale_proxy_strips(ed, strips, check_hash=True):
+    """
+    The strips whose proxies are missing from their manifest or out of
+    date. The new mtimes of sources found unchanged are saved, so they are
+    not hashed again.
+    """
+    stale = []
+    manifests = set()
+    for s, source, settings, manifest in _proxy_manifests(ed, strips):
+        if manifest.is_stale(source, settings, check_hash):
+            stale.append(s)
+        manifests.add(manifest)
+    for manifest in manifests:
+        if manifest.changed:
+            try:
+                manifest.save()
+            except OSError:
+                pass
+    return stale
+
+
+def record_proxies(ed, strips):
+    """Write the current sources and settings of strips to their proxy manifests"""
+    manifests = set()
+    for s, source, settings, manifest in _proxy_manifests(ed, strips):
+        try:
+            manifest.record(source, settings, strip_proxy_files(ed, s, settings["sizes"]))
+        except OSError:
+            continue
+        manifests.add(manifest)
+    for manifest in manifests:
+        manifest.save()
+    _stale_count.clear()
+
+
+_stale_count = {}
+_stale_jobs = {}
+_stale_pool = None
+
+
+def _count_stale_proxies(entries):
+    # Runs in a worker thread, so the files are never read while drawing.
+    manifests = {}
+    count = 0
+    for directory, source, settings in entries:
+        manifest = manifests.get(directory)
+        if manifest is None:
+            manifest = manifests[directory] = sequencer_media.ProxyManifest(directory)
+        count += manifest.is_stale(source, settings, check_hash=False)
+    return count
+
+
+def stale_proxy_count(context, max_age=5.0):
+    """
+    Number of proxies which look stale from size and mtime, for the proxy
+    panel, None before the first count. Only the cached count is read, it
+    is recounted in a background thread at most every max_age seconds.
+    """
+    global _stale_pool
+    ed = context.scene.sequence_editor
+    key = ed.as_pointer()
+    cached = _stale_count.get(key)
+    if key not in _stale_jobs and (cached is None or time.monotonic() - cached[0] > max_age):
+        entries = []
+        for s in proxy_strips(ed):
+            entries.append((strip_proxy_dir(ed, s), strip_proxy_source(s), proxy_settings(s)))
+        if _stale_pool is None:
+            _stale_pool = ThreadPoolExecutor(max_workers=1)
+        _stale_jobs[key] = _stale_pool.submit(_count_stale_proxies, entries)
+        if not bpy.app.timers.is_registered(_collect_stale_counts):
+            bpy.app.timers.register(_collect_stale_counts, first_interval=0.2, persistent=True)
+    return cached[1] if cached is not None else None
+
+
+def _collect_stale_counts():
+    done = [key for key, job in _stale_jobs.items() if job.done()]
+    for key in done:
+        job = _stale_jobs.pop(key)
+        try:
+            _stale_count[key] = (time.monotonic(), job.result())
+        except Exception:
+            _stale_count[key] = (time.monotonic(), 0)
+    if done:
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'SEQUENCE_EDITOR':
+                    area.tag_redraw()
+    return 0.2 if _stale_jobs else None
+
+
+_media_index = None
+_media_info = {}
+
+
+def media_index():
+    """The global sequencer_media.MediaIndex, opened on first use"""
+    global _media_index
+    if _media_index is None:
+        _media_index = sequencer_media.MediaIndex(workers=max(2, (os.cpu_count() or 2) // 2))
+    return _media_index
+
+
+def media_path(strip):
+    """Absolute path of the media file of a movie, image or sound strip, None for other strips"""
+    if strip.type == 'MOVIE' or (strip.type == 'IMAGE' and len(strip.elements)):
+        return strip_source_path(strip)
+    if strip.type == 'SOUND' and strip.sound:
+        return os.path.normpath(bpy.path.abspath(strip.sound.filepath))
+    return None
+
+
+def media_info(strip):
+    """
+    Properties of the media file of strip from the media index, see
+    sequencer_media.probe_media. None while the file is being probed.
+    """
+    path = media_path(strip)
+    if path is None:
+        return None
+    try:
+        return _media_info[path]
+    except KeyError:
+        pass
+
+    index = media_index()
+    info = _media_info[path] = index.get(path)
+    if info is None and not index.is_pending(path):
+        probe_media_files([path])
+    return info
+
+
+def media_probe_error():
+    """Why the media files can't be probed, for the panels, None when they can"""
+    if media_index().ffprobe is None:
+        return "ffprobe not found"
+    return None
+
+
+def probe_media_files(paths):
+    """Probe media files in the background, sequencer areas redraw as results come in"""
+    if media_index().refresh(paths) and not bpy.app.timers.is_registered(_collect_media_probes):
+        bpy.app.timers.register(_collect_media_probes, first_interval=0.5, persistent=True)
+
+
+def _collect_media_probes():
+    index = media_index()
+    if index.collect():
+        _media_info.clear()
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'SEQUENCE_EDITOR':
+                    area.tag_redraw()
+    return 0.5 if index.pending else None
+
+
+@persistent
+def probe_project_media(*args):
+    """
+    Probe the media of all strips in the background after a file is loaded,
+    used as handler. Background Blender processes, like the proxy workers,
+    don't probe: nothing would collect the results there.
+    """
+    _media_info.clear()
+    if bpy.app.background:
+        return
+    paths = []
+    for scene in bpy.data.scenes:
+        if scene.sequence_editor:
+            for s in scene.sequence_editor.sequences_all:
+                path = media_path(s)
+                if path is not None:
+                    paths.append(path)
+    if paths:
+        probe_media_files(paths)
+
+
+# Custom property of sound strips drawing their waveform from the peak cache.
+PEAKS_PROP = "waveform_peaks"
+
+_peak_pool = None
+_peak_jobs = {}
+_peak_files = {}
+_peak_errors = {}
+_peak_draw_handle = None
+_peak_shader = None
+
+
+def peak_file(path):
+    """
+    The sequencer_peaks.PeakFile of a sound file, None until
+    build_waveform_peaks() found or built it. Never reads a file, it is
+    called while drawing.
+    """
+    return _peak_files.get(path)
+
+
+def peak_error(path):
+    """Why building the peaks of a sound file failed, None when it didn't"""
+    return _peak_errors.get(path)
+
+
+def _aud_chunks(sound, seconds=60.0):
+    # Decode a sound through aud a limited stretch at a time, so long
+    # recordings are never held in memory as a whole.
+    start = 0.0
+    while True:
+        data = sound.limit(start, start + seconds).data()
+        if not len(data):
+            return
+        yield data
+        start += seconds
+
+
+def _build_peaks(path, sample_rate, channels):
+    # Runs in a worker thread, hashing the sound to find its cached peaks
+    # as well. ffmpeg decodes the sound in chunks, without it aud does.
+    peaks = sequencer_peaks.cached_peaks(path)
+    if peaks is not None:
+        return peaks
+    try:
+        return sequencer_peaks.build_peaks(path, sample_rate=sample_rate, channels=channels)
+    except OSError:
+        import aud
+        sound = aud.Sound(path)
+        sample_rate, channels = sound.specs
+        return sequencer_peaks.build_peaks(path, _aud_chunks(sound), int(sample_rate), int(channels))
+
+
+def build_waveform_peaks(paths):
+    """
+    Load the cached peaks of sound files in the background, building the
+    missing ones, sequencer areas redraw when done
+    """
+    global _peak_pool
+    for path in paths:
+        if path in _peak_jobs or path in _peak_files or not os.path.isfile(path):
+            continue
+        if _peak_pool is None:
+            _peak_pool = ThreadPoolExecutor(max_workers=2)
+        info = media_index().get(path) or {}
+        _peak_errors.pop(path, None)
+        _peak_jobs[path] = _peak_pool.submit(
+            _build_peaks, path, info.get("sample_rate"), info.get("audio_channels"))
+
+    if _peak_jobs and not bpy.app.timers.is_registered(_collect_peaks):
+        bpy.app.timers.register(_collect_peaks, first_interval=0.5, persistent=True)
+
+
+def _collect_peaks():
+    done = [path for path, job in _peak_jobs.items() if job.done()]
+    for path in done:
+        job = _peak_jobs.pop(path)
+        try:
+            _peak_files[path] = job.result()
+        except Exception as ex:
+            # Shown in the sound strip panel.
+            _peak_files.pop(path, None)
+            _peak_errors[path] = str(ex) or type(ex).__name__
+    if done:
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'SEQUENCE_EDITOR':
+                    area.tag_redraw()
+    return 0.5 if _peak_jobs else None
+
+
+def _peak_lines(strip, peaks, frame_start, frame_end, frames_per_pixel, fps):
+    # Vertices of one vertical min/max line per pixel over the visible part
+    # of strip, and of the RMS lines. Pitch plays the sound faster, as
+    # does the speed factor of newer Blender versions. A hard cut start
+    # plays the sound from animation_offset_start frames in.
+    speed = strip.pitch * getattr(strip, "speed_factor", 1.0)
+    samples_per_frame = peaks.sample_rate / fps * speed
+    level = peaks.level_for(frames_per_pixel * samples_per_frame)
+    samples_per_bucket = peaks.samples_per_bucket(level)
+    buckets = peaks.level(level)
+
+    frames_per_bucket = samples_per_bucket / samples_per_frame
+    sound_start = strip.frame_start - strip.animation_offset_start
+    first = max(0, int((frame_start - sound_start) / frames_per_bucket))
+    last = min(len(buckets), int(math.ceil((frame_end - sound_start) / frames_per_bucket)))
+    if last <= first:
+        return None
+
+    rows = buckets[first:last]
+    stride = max(1, int(frames_per_pixel / frames_per_bucket))
+    if stride > 1:
+        groups = np.arange(0, len(rows), stride)
+        rows = np.stack((
+            np.minimum.reduceat(rows[:, 0], groups),
+            np.maximum.reduceat(rows[:, 1], groups),
+            np.sqrt(np.add.reduceat(np.square(rows[:, 2]), groups) / stride),
+        ), axis=1)
+
+    center = strip.channel + 0.5
+    height = 0.3 * min(strip.volume, 1.0)
+    x = sound_start + (first + np.arange(len(rows)) * stride) * frames_per_bucket
+    verts = np.empty((len(rows), 2, 2), dtype=np.float32)
+    verts[:, :, 0] = x[:, None]
+    verts[:, 0, 1] = center + rows[:, 0] * height
+    verts[:, 1, 1] = center + rows[:, 1] * height
+    rms = verts.copy()
+    rms[:, 0, 1] = center - rows[:, 2] * height
+    rms[:, 1, 1] = center + rows[:, 2] * height
+    return verts.reshape(-1, 2), rms.reshape(-1, 2)
+
+
+def draw_waveform_peaks():
+    """Draw the waveforms of sound strips using the peak cache, used as draw handler of the timeline"""
+    global _peak_shader
+    context = bpy.context
+    st = context.space_data
+    scene = context.scene
+    if st.view_type == 'PREVIEW' or st.waveform_display_type == 'NO_WAVEFORMS' or not scene.sequence_editor:
+        return
+
+    region = context.region
+    view_start = region.view2d.region_to_view(0, 0)[0]
+    view_end = region.view2d.region_to_view(region.width, 0)[0]
+    if view_end <= view_start:
+        return
+    frames_per_pixel = (view_end - view_start) / region.width
+    fps = scene.render.fps / scene.render.fps_base
+
+    peak_lines = []
+    rms_lines = []
+    for s in sequences_owner(context).sequences:
+        if (s.type != 'SOUND' or not s.get(PEAKS_PROP) or
+                s.frame_final_end <= view_start or s.frame_final_start >= view_end):
+            continue
+        path = media_path(s)
+        peaks = peak_file(path) if path else None
+        if peaks is None:
+            continue
+        lines = _peak_lines(
+            s, peaks, max(s.frame_final_start, view_start), min(s.frame_final_end, view_end),
+            frames_per_pixel, fps)
+        if lines is not None:
+            peak_lines.append(lines[0])
+            rms_lines.append(lines[1])
+    if not peak_lines:
+        return
+
+    if _peak_shader is None:
+        _peak_shader = gpu.shader.from_builtin('2D_UNIFORM_COLOR')
+    _peak_shader.bind()
+    for lines, color in ((peak_lines, (0.9, 0.9, 0.9, 0.5)), (rms_lines, (1.0, 1.0, 1.0, 0.8))):
+        batch = batch_for_shader(_peak_shader, 'LINES', {"pos": np.concatenate(lines)})
+        _peak_shader.uniform_float("color", color)
+        batch.draw(_peak_shader)
+
+
+def show_waveform_peaks():
+    """Add the peak waveform draw handler to the sequencer timeline once"""
+    global _peak_draw_handle
+    if _peak_draw_handle is None:
+        _peak_draw_handle = bpy.types.SpaceSequenceEditor.draw_handler_add(
+            draw_waveform_peaks, (), 'WINDOW', 'POST_VIEW')
+
+
+@persistent
+def load_waveform_peaks(*args):
+    """
+    Build the peaks of the sound strips drawing them after a file is
+    loaded, used as handler. Not in background Blender processes, which
+    have no timeline to draw them in.
+    """
+    _peak_files.clear()
+    _peak_errors.clear()
+    if bpy.app.background:
+        return
+    paths = []
+    for scene in bpy.data.scenes:
+        if scene.sequence_editor:
+            for s in scene.sequence_editor.sequences_all:
+                if s.type == 'SOUND' and s.get(PEAKS_PROP):
+                    path = media_path(s)
+                    if path is not None:
+                        paths.append(path)
+    if paths:
+        show_waveform_peaks()
+        build_waveform_peaks(paths)
+
+
+def proxy_queue_path(blend_path):
+    """The parallel proxy build queue of a .blend file, stored next to it"""
+    return os.path.splitext(blend_path)[0] + ".proxy_queue.json"
+
+
+def load_proxy_queue(path):
+    """Entries of a saved proxy build queue, empty when there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)["strips"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def save_proxy_queue(path, queue):
+    # Written through a temporary file, so an interrupted build always
+    # leaves a complete queue to resume from.
+    sequencer_media.write_json(path, {"strips": queue})
+
+
+def proxy_worker_command(blend_path, names, overwrite=False):
+    """Command line of a background Blender building the proxies of the named strips"""
+    return [
+        bpy.app.binary_path, "--background", blend_path,
+        "--python-exit-code", "1",
+        "--python-expr",
+        "import sys; from bl_operators.sequencer import proxy_build_worker; "
+        "proxy_build_worker(sys.argv[sys.argv.index('--') + 1:], overwrite=%r)" % overwrite,
+        "--",
+    ] + list(names)
+
+
+def proxy_build_worker(names, overwrite=False):
+    """Build the proxies of the named strips, run in the worker processes of the proxy scheduler"""
+    scene = bpy.context.scene
+    names = set(names)
+    found = set()
+    for s in scene.sequence_editor.sequences_all:
+        s.select = s.name in names
+        if s.select:
+            if not s.use_proxy:
+                raise ValueError("Proxies are not enabled for " + s.name)
+            found.add(s.name)
+            if overwrite:
+                s.proxy.use_overwrite = True
+
+    missing = names - found
+    if missing:
+        raise ValueError("Strips not found: " + ", ".join(sorted(missing)))
+
+    window = bpy.context.window_manager.windows[0]
+    area = window.screen.areas[0]
+    area.type = 'SEQUENCE_EDITOR'
+    override = {
+        "window": window,
+        "screen": window.screen,
+        "area": area,
+        "region": next(r for r in area.regions if r.type == 'WINDOW'),
+        "scene": scene,
+    }
+    bpy.ops.sequencer.rebuild_proxy(override)
+
+
+class ProxyBuildState:
+    """Progress of the parallel proxy build, shown in the proxy panel"""
+    running = False
+    queue = []
+
+
 class SEQUENCER_OT_CrossfadeSounds(Operator):
-    """Do cross-fading volume animation of two selected sound strips"""
+    """Do cross-fading volume animation of overlapping selected sound strips"""
 
     bl_idname = "sequencer.crossfade_sounds"
     bl_label = "Crossfade sounds"
     bl_options = {'REGISTER', 'UNDO'}
 
+    # bl_operators only registers the classes of this module, so its first
+    # class adds and removes the handlers of the module.
+    @classmethod
+    def register(cls):
+        register()
+
+    @classmethod
+    def unregister(cls):
+        unregister()
+
+    curve: EnumProperty(
+        name="Curve", description="Shape of the volume fades",
+        items=(
+            ('SMOOTH', "Smooth", "Ease in and out of the fades"),
+            ('LINEAR', "Linear", "Change the volume at a constant rate"),
+            ('EQUAL_POWER', "Equal Power", "Keep the combined loudness constant during the fade"),
+        ),
+    )
+    steps: IntProperty(
+        name="Steps",
+        description="Number of segments of equal power fades",
+        min=2, max=64,
+        default=8,
+    )
+
     @classmethod
     def poll(cls, context):
         if context.scene and context.scene.sequence_editor and context.scene.sequence_editor.active_strip:
@@ -45,41 +1617,19 @@ class SEQUENCER_OT_CrossfadeSounds(Operator):
             return False
 
     def execute(self, context):
-        seq1 = None
-        seq2 = None
-        for s in context.scene.sequence_editor.sequences:
-            if s.select and s.type == 'SOUND':
-                if seq1 is None:
-                    seq1 = s
-                elif seq2 is None:
-                    seq2 = s
-                else:
-                    seq2 = None
-                    break
-        if seq2 is None:
-            self.report({'ERROR'}, "Select 2 sound strips")
+        sounds = [s for s in context.selected_sequences if s.type == 'SOUND']
+        if len(sounds) < 2:
+            self.report({'ERROR'}, "Select 2 or more sound strips")
             return {'CANCELLED'}
-        if seq1.frame_final_start > seq2.frame_final_start:
-            s = seq1
-            seq1 = seq2
-            seq2 = s
-        if seq1.frame_final_end > seq2.frame_final_start:
-            tempcfra = context.scene.frame_current
-            context.scene.frame_current = seq2.frame_final_start
-            seq1.keyframe_insert("volume")
-            context.scene.frame_current = seq1.frame_final_end
-            seq1.volume = 0
-            seq1.keyframe_insert("volume")
-            seq2.keyframe_insert("volume")
-            context.scene.frame_current = seq2.frame_final_start
-            seq2.volume = 0
-            seq2.keyframe_insert("volume")
-            context.scene.frame_current = tempcfra
-            return {'FINISHED'}
-        else:
+
+        pairs = crossfade_pairs(sounds)
+        if not pairs:
             self.report({'ERROR'}, "The selected strips don't overlap")
             return {'CANCELLED'}
 
+        crossfade_sounds(context.scene, pairs, self.curve, self.steps)
+        return {'FINISHED'}
+
 
 class SEQUENCER_OT_CutMulticam(Operator):
     """Cut multi-cam strip and select camera"""
@@ -110,16 +1660,67 @@ class SEQUENCER_OT_CutMulticam(Operator):
         if s.multicam_source == camera or camera >= s.channel:
             return {'FINISHED'}
 
-        if not s.select:
-            s.select = True
-
         cfra = context.scene.frame_current
-        bpy.ops.sequencer.cut(frame=cfra, type='SOFT', side='RIGHT')
-        for s in context.scene.sequence_editor.sequences_all:
-            if s.select and s.type == 'MULTICAM' and s.frame_final_start <= cfra and cfra < s.frame_final_end:
-                context.scene.sequence_editor.active_strip = s
+        for part in cut_multicam(context, s, [(cfra, camera)]):
+            if part.frame_final_start <= cfra < part.frame_final_end:
+                part.select = True
+                context.scene.sequence_editor.active_strip = part
 
-        context.scene.sequence_editor.active_strip.multicam_source = camera
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_CutMulticamList(Operator):
+    """Cut multi-cam strip at every camera change of a cut list"""
+
+    bl_idname = "sequencer.cut_multicam_list"
+    bl_label = "Cut Multicam from List"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    source: EnumProperty(
+        name="Source", description="Where the camera cuts are read from",
+        items=(
+            ('MARKERS', "Markers", "Timeline markers named after a camera number, like \"2\" or \"Cam 2\""),
+            ('FILE', "File", "CSV file with a frame and a camera number per row"),
+        ),
+    )
+    filepath: StringProperty(
+        subtype='FILE_PATH',
+    )
+    filter_glob: StringProperty(
+        default="*.csv;*.txt",
+        options={'HIDDEN'},
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if context.scene and context.scene.sequence_editor and context.scene.sequence_editor.active_strip:
+            return context.scene.sequence_editor.active_strip.type == 'MULTICAM'
+        else:
+            return False
+
+    def invoke(self, context, event):
+        if self.source == 'FILE':
+            context.window_manager.fileselect_add(self)
+            return {'RUNNING_MODAL'}
+        return self.execute(context)
+
+    def execute(self, context):
+        scene = context.scene
+
+        if self.source == 'FILE':
+            try:
+                cuts = multicam_cuts_from_csv(bpy.path.abspath(self.filepath))
+            except OSError as ex:
+                self.report({'ERROR'}, str(ex))
+                return {'CANCELLED'}
+        else:
+            cuts = multicam_cuts_from_markers(scene)
+
+        if not cuts:
+            self.report({'ERROR'}, "No camera cuts found")
+            return {'CANCELLED'}
+
+        cut_multicam(context, scene.sequence_editor.active_strip, cuts)
         return {'FINISHED'}
 
 
@@ -135,9 +1736,7 @@ class SEQUENCER_OT_DeinterlaceSelectedMovies(Operator):
         return (context.scene and context.scene.sequence_editor)
 
     def execute(self, context):
-        for s in context.scene.sequence_editor.sequences_all:
-            if s.select and s.type == 'MOVIE':
-                s.use_deinterlace = True
+        bulk_set(selected_strips_all(context), {"use_deinterlace": True}, {'MOVIE'})
         return {'FINISHED'}
 
 
@@ -153,10 +1752,7 @@ class SEQUENCER_OT_ReverseSelectedMovies(Operator):
         return (context.scene and context.scene.sequence_editor)
 
     def execute(self, context):
-        for s in context.scene.sequence_editor.sequences_all:
-            if s.select:
-                if s.type == 'MOVIE' or s.type == 'IMAGE':
-                    s.use_reverse_frames = not s.use_reverse_frames
+        bulk_set(selected_strips_all(context), {"use_reverse_frames": TOGGLE}, {'MOVIE', 'IMAGE'})
         return {'FINISHED'}
 
 
@@ -172,10 +1768,7 @@ class SEQUENCER_OT_FlipXSelectedMovies(Operator):
         return (context.scene and context.scene.sequence_editor)
 
     def execute(self, context):
-        for s in context.scene.sequence_editor.sequences_all:
-            if s.select:
-                if s.type == 'MOVIE' or s.type == 'IMAGE':
-                    s.use_flip_x = not s.use_flip_x
+        bulk_set(selected_strips_all(context), {"use_flip_x": TOGGLE}, {'MOVIE', 'IMAGE'})
         return {'FINISHED'}
 
 
@@ -191,10 +1784,7 @@ class SEQUENCER_OT_FlipYSelectedMovies(Operator):
         return (context.scene and context.scene.sequence_editor)
 
     def execute(self, context):
-        for s in context.scene.sequence_editor.sequences_all:
-            if s.select:
-                if s.type == 'MOVIE' or s.type == 'IMAGE':
-                    s.use_flip_y = not s.use_flip_y
+        bulk_set(selected_strips_all(context), {"use_flip_y": TOGGLE}, {'MOVIE', 'IMAGE'})
         return {'FINISHED'}
 
 
@@ -205,16 +1795,79 @@ class SEQUENCER_OT_ShowWaveformSelectedSounds(Operator):
     bl_label = "Show Waveform"
     bl_options = {'REGISTER', 'UNDO'}
 
+    use_peak_cache: BoolProperty(
+        name="Peak Cache",
+        description="Draw the waveforms from peaks built in the background instead of decoding the sounds",
+        default=True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene and context.scene.sequence_editor
+
+    def execute(self, context):
+        if not self.use_peak_cache:
+            bulk_set(selected_strips_all(context), {"show_waveform": TOGGLE}, {'SOUND'})
+            return {'FINISHED'}
+
+        strips = [s for s in selected_strips_all(context) if s.type == 'SOUND']
+        show = not all(s.get(PEAKS_PROP) for s in strips)
+        paths = []
+        for s in strips:
+            s[PEAKS_PROP] = show
+            if show:
+                s.show_waveform = False
+                path = media_path(s)
+                if path is not None:
+                    paths.append(path)
+        if paths:
+            show_waveform_peaks()
+            build_waveform_peaks(paths)
+        if context.area:
+            context.area.tag_redraw()
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_BulkSet(Operator):
+    """Set several properties of all selected strips at once"""
+
+    bl_idname = "sequencer.bulk_set"
+    bl_label = "Set Properties"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    assignments: StringProperty(
+        name="Properties",
+        description="Properties to set, like: use_flip_x=toggle, use_deinterlace=true, blend_alpha=0.5",
+        default="",
+    )
+    types: StringProperty(
+        name="Types",
+        description="Strip types to change, like: MOVIE, IMAGE. Empty for all types",
+        default="",
+    )
+
     @classmethod
     def poll(cls, context):
         return context.scene and context.scene.sequence_editor
 
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
     def execute(self, context):
+        try:
+            values = parse_assignments(self.assignments)
+        except ValueError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
 
-        for strip in context.scene.sequence_editor.sequences_all:
-            if strip.select and strip.type == 'SOUND':
-                strip.show_waveform = not strip.show_waveform
+        types = {t.strip().upper() for t in self.types.split(",") if t.strip()} or None
+        try:
+            changed = bulk_set(selected_strips_all(context), values, types)
+        except (TypeError, ValueError) as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
 
+        self.report({'INFO'}, "Changed %d strips" % changed)
         return {'FINISHED'}
 
 
@@ -238,30 +1891,22 @@ class SEQUENCER_OT_SelectCurrentFrame(bpy.types.Operator):
         return bpy.context.area.type == 'SEQUENCE_EDITOR' and bpy.context.scene.sequence_editor
 
     def execute(self, context):
-        current_frame = bpy.context.scene.frame_current
-        sel_strips = []
-        lock_num = 0
-        lock_sel_num = 0
-        reportMessage = ""
+        current_frame = context.scene.frame_current
         if self.extend == "FALSE": bpy.ops.sequencer.select_all(action='DESELECT')
-        
-        for strip in bpy.context.sequences:
-            if strip.lock and strip.select:
-                lock_sel_num += 1
-            if strip.frame_final_end >= current_frame:
-                if strip.frame_final_start <= current_frame:
-                    if strip.lock and not strip.select:
-                        lock_num += 1
-                    else:
-                        strip.select=True
-                        context.scene.sequence_editor.active_strip = strip
-                        sel_strips.append(strip)
-        if sel_strips != []:
-            for strip in sel_strips:
-                if strip.frame_final_end == current_frame:
-                    strip.select_right_handle = True
-                elif strip.frame_final_start == current_frame:
-                    strip.select_left_handle = True
+
+        active = None
+        for strip in channel_index(context).strips_at_frame(current_frame, include_end=True):
+            if strip.lock and not strip.select:
+                continue
+            strip.select = True
+            active = strip
+            if strip.frame_final_end == current_frame:
+                strip.select_right_handle = True
+            elif strip.frame_final_start == current_frame:
+                strip.select_left_handle = True
+
+        if active is not None:
+            context.scene.sequence_editor.active_strip = active
 
         return {"FINISHED"}
 
@@ -273,20 +1918,30 @@ class SEQUENCER_OT_SelectChannelStrips(Operator):
     bl_label = "Select Channel Strips"
     bl_options = {'REGISTER', 'UNDO'}
 
+    extend: BoolProperty(
+        name="Extend",
+        description="Add the channel strips to the current selection",
+        default=False,
+    )
+
     @classmethod
     def poll(cls, context):
         return (context.scene and context.scene.sequence_editor)
 
     def execute(self, context):
-        selection = bpy.context.selected_sequences
+        selection = context.selected_sequences
         if not selection:
             return {'CANCELLED'}
 
-        sequences = bpy.context.scene.sequence_editor.sequences_all
+        channels = {s.channel for s in selection}
+        index = channel_index(context)
 
-        for s in selection:
-            for strip in sequences:
-                strip.select = strip.channel == s.channel
+        if not self.extend:
+            bpy.ops.sequencer.select_all(action='DESELECT')
+
+        for channel in channels:
+            for strip in index.strips(channel):
+                strip.select = True
 
         return {'FINISHED'}
 
@@ -306,14 +1961,9 @@ class SEQUENCER_OT_SelectLockedStrips(bpy.types.Operator):
         return False
 
     def execute(self, context):
-        lockedStrips = []
-        for strip in bpy.context.sequences:
-            if strip.lock:
-                lockedStrips.append(strip)
-        if lockedStrips != []:
-            bpy.ops.sequencer.select_all(action='DESELECT')
-            for strip in lockedStrips:
-                strip.select = True
+        lockedStrips = query_strips(context, "lock")
+        if lockedStrips:
+            apply_selection(context, lockedStrips)
 
         return {'FINISHED'}
 
@@ -333,14 +1983,56 @@ class SEQUENCER_OT_SelectMuteStrips(bpy.types.Operator):
         return False
 
     def execute(self, context):
-        muteStrips = []
-        for strip in bpy.context.sequences:
-            if strip.mute:
-                muteStrips.append(strip)
-        if muteStrips != []:
-            bpy.ops.sequencer.select_all(action='DESELECT')
-            for strip in muteStrips:
-                strip.select = True
+        muteStrips = query_strips(context, "mute")
+        if muteStrips:
+            apply_selection(context, muteStrips)
+
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_SelectQuery(bpy.types.Operator):
+    """Select strips matching a query"""
+
+    bl_idname = "sequencer.select_query"
+    bl_label = "Select Query"
+    bl_description = "Select strips matching a query like: type in {MOVIE, IMAGE} and channel > 2 and not lock"
+    bl_options = {"REGISTER", "UNDO"}
+
+    expression: StringProperty(
+        name="Query",
+        description="Strips to select, like: type == SOUND and frame in [100, 500]",
+        default="",
+    )
+    mode: EnumProperty(
+        name="Mode",
+        description="How to combine the matches with the current selection",
+        items=(
+            ('SET', "Set", "Select only the matching strips"),
+            ('ADD', "Extend", "Add the matching strips to the selection"),
+            ('SUBTRACT', "Subtract", "Deselect the matching strips"),
+            ('INTERSECT', "Intersect", "Keep only selected strips that match"),
+        ),
+        default='SET',
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if context.sequences:
+            return True
+        return False
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        try:
+            strips = query_strips(context, self.expression)
+        except ValueError as error:
+            self.report({'ERROR'}, "Query: %s" % error)
+            return {'CANCELLED'}
+
+        apply_selection(context, strips, self.mode)
+        self.report({'INFO'}, "%d strips match" % len(strips))
 
         return {'FINISHED'}
 
@@ -463,29 +2155,28 @@ class SEQUENCER_OT_SplitRemove(bpy.types.Operator):
         return False
 
     def execute(self, context):
-        scene = bpy.context.scene
-        sequencer = bpy.ops.sequencer
-        selection = bpy.context.selected_sequences
+        frame = context.scene.frame_current
+        selection = context.selected_sequences
         if not selection:
             return {'CANCELLED'}
 
-        #Get current frame selection:
-        bpy.ops.sequencer.select_current_frame(extend='FALSE')
-        cf_selection = bpy.context.selected_sequences
-        bpy.ops.sequencer.select_all(action='DESELECT')
+        names = {s.name for s in selection}
+        strips = [
+            s for s in selection
+            if not s.lock and s.frame_final_start < frame < s.frame_final_end
+        ]
 
-        for s in selection:
-            for i in cf_selection:
-                if not s.lock and s == i:
-                    bpy.ops.sequencer.select_all(action='DESELECT')
-                    s.select = True
-                    sequencer.cut(frame=scene.frame_current, type='SOFT', side=self.direction)
-                    if self.method == "EXTRACT": 
-                        sequencer.ripple_delete()
-                    else:
-                        sequencer.delete_lift()
-                    s.select = False
-        for s in selection: s.select = True
+        # The cut strips keep the part left of the frame.
+        right_parts = split_strips(context, strips, frame)
+        removed = strips if self.direction == 'LEFT' else right_parts
+
+        if self.method == 'EXTRACT':
+            ripple_delete(context, removed)
+        else:
+            lift_strips(context, removed)
+
+        for s in context.sequences:
+            s.select = s.name in names
 
         return {'FINISHED'}
 
@@ -509,13 +2200,10 @@ class SEQUENCER_OT_DeleteLift(bpy.types.Operator):
         if not selection:
             return {'CANCELLED'}
 
-        for s in selection:
-            if not s.lock:
-                bpy.ops.sequencer.select_all(action='DESELECT')
-                s.select = True
-                bpy.ops.sequencer.delete()
-                s.select = False
-                for s in selection: s.select = True
+        locked = [s for s in selection if s.lock]
+        lift_strips(context, [s for s in selection if not s.lock])
+        for s in locked:
+            s.select = True
 
         return {'FINISHED'}
 
@@ -535,52 +2223,12 @@ class SEQUENCER_OT_RippleDelete(bpy.types.Operator):
 
     def execute(self, context):
 
-        selection = context.selected_sequences
-        selection = sorted(selection, key=attrgetter('channel', 'frame_final_start'))
+        selection = [s for s in context.selected_sequences if not s.lock]
 
         if not selection:
             return {'CANCELLED'}
 
-        for seq in selection:
-            if seq.lock == False:
-                context.scene.sequence_editor.active_strip = seq # set as active or it won't work
-                distance = (seq.frame_final_end - seq.frame_final_start)
-                bpy.ops.sequencer.select_all(action='DESELECT')
-                seq.select = True
-
-                bpy.ops.sequencer.select_active_side(side='RIGHT') # Select to the right
-                seq.select=False
-                seqs = context.selected_sequences
-
-                bpy.ops.sequencer.select_all(action='DESELECT') # cut only active strip
-                seq.select=True
-                seq_out=seq.frame_final_end
-                bpy.ops.sequencer.delete()
-
-                seqs=sorted(seqs, key=attrgetter('channel', 'frame_final_start'))
-
-                # delete effect strips(ex. dissolves) if they are adjoined selected strips:
-                if len(seqs)-1 > 1:
-                    if seqs[1].type in {
-                    'CROSS', 'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-                    'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP', 'WIPE', 'GLOW',
-                    'TRANSFORM', 'SPEED', 'GAUSSIAN_BLUR', 'COLORMIX',
-                    }:
-                        seqs[1].select=True
-                        #distance=distance + (seqs[1].frame_final_duration) # can't get the duration of the transition?
-                        bpy.ops.sequencer.delete()
-
-                distance=-distance
-
-                for s in seqs:
-                    if s.lock == True:
-                        break
-                    if s.type not in {
-                    'CROSS', 'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-                    'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP', 'WIPE', 'GLOW',
-                    'TRANSFORM', 'SPEED', 'GAUSSIAN_BLUR', 'COLORMIX',
-                    }:
-                        s.frame_start += distance
+        ripple_delete(context, selection)
 
         return {'FINISHED'}
 
@@ -630,53 +2278,70 @@ class SEQUENCER_OT_Move(bpy.types.Operator):
             ('RIGHT', "Right", "Move Selection Right"),
         ),
     )
+    step_type: EnumProperty(
+        name="Step", description="Step size of left and right moves",
+        items=(
+            ('FRAMES', "Frames", "Move by a number of frames"),
+            ('SECONDS', "Seconds", "Move by a number of seconds"),
+            ('EDIT_POINT', "Edit Point", "Move to the next start or end of another strip"),
+        ),
+    )
+    frames: IntProperty(
+        name="Frames",
+        min=1,
+        default=25,
+    )
+    seconds: FloatProperty(
+        name="Seconds",
+        min=0.0,
+        default=1.0,
+    )
 
     @classmethod
     def poll(cls, context):
-        return bpy.context.scene is not None
+        return (context.scene and context.scene.sequence_editor)
 
     def execute(self, context):
 
         selection = context.selected_sequences
-        selection = sorted(selection, key=attrgetter('channel', 'frame_final_start'))
+        strips = [s for s in selection if not s.lock and not has_inputs(s)]
 
-        if self.direction == "UP":
-            selection.reverse()
+        if not strips:
+            return {'CANCELLED'}
 
-        if not selection:
+        if self.direction in {'UP', 'DOWN'}:
+            moved = move_strips(context, strips, channel_delta=1 if self.direction == 'UP' else -1)
+            return {'FINISHED'} if moved != (0, 0) else {'CANCELLED'}
+
+        forward = self.direction == 'RIGHT'
+        if self.step_type == 'EDIT_POINT':
+            frames = edit_point_distance(context, strips, forward)
+        elif self.step_type == 'SECONDS':
+            render = context.scene.render
+            frames = round(self.seconds * render.fps / render.fps_base)
+        else:
+            frames = self.frames
+
+        if not frames:
             return {'CANCELLED'}
 
-        for s in selection:
-            if not s.lock and s.type not in {
-                    'CROSS', 'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-                    'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP', 'WIPE', 'GLOW',
-                    'TRANSFORM', 'SPEED', 'GAUSSIAN_BLUR', 'COLORMIX',
-                    }:
-                current_start = s.frame_final_start
-                current_channel = s.channel
-                bpy.ops.sequencer.select_all(action='DESELECT')
-                s.select = True
-                context.scene.sequence_editor.active_strip = s
-                if self.direction == "UP":
-                    if (s.channel < 32):
-                        s.channel += 1
-                elif self.direction == "DOWN":
-                    if (s.channel > 1):
-                        s.channel -= 1
-                elif self.direction == "LEFT":
-                    bpy.ops.transform.seq_slide(value=(-25, 0))
-                    if s.frame_final_start == current_start:
-                        bpy.ops.sequencer.swap(side='LEFT')
-
-                elif self.direction == "RIGHT":
-                    bpy.ops.transform.seq_slide(value=(25, 0))
-                    if s.frame_final_start == current_start:
-                        bpy.ops.sequencer.swap(side='RIGHT')
-                s.select = False
+        frame_delta, _channel_delta = move_strips(context, strips, frame_delta=frames if forward else -frames)
 
+        if frame_delta:
+            return {'FINISHED'}
+        if len(strips) > 1:
+            return {'CANCELLED'}
+
+        # A single blocked strip swaps place with its neighbour instead.
+        s = strips[0]
+        bpy.ops.sequencer.select_all(action='DESELECT')
+        s.select = True
+        context.scene.sequence_editor.active_strip = s
+        swapped = bpy.ops.sequencer.swap(side=self.direction)
         for s in selection: s.select = True
+        invalidate_caches()
 
-        return {'FINISHED'}
+        return {'FINISHED'} if 'FINISHED' in swapped else {'CANCELLED'}
 
 
 class SEQUENCER_OT_MatchFrame(bpy.types.Operator):
@@ -698,47 +2363,76 @@ class SEQUENCER_OT_MatchFrame(bpy.types.Operator):
         if not selection:
             return {'CANCELLED'}
 
+        sequences = sequences_owner(context).sequences
+        # Strips inside meta strips can't be added through the data API.
+        use_data_api = hasattr(sequences, "new_movie")
+
+        # Find empty channel once, copies are stacked from there on:
+        empty_channel = max(s.channel for s in sequences) + 1
+        placed = {}
+        skipped = []
+
         for seq in selection:
 
-            if seq.type not in {
-            'CROSS', 'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-            'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP', 'WIPE', 'GLOW',
-            'TRANSFORM', 'SPEED', 'GAUSSIAN_BLUR', 'COLORMIX',
-            }:
-
-                # Find empty channel:
-                sequences = bpy.context.sequences
-                if not sequences:
-                    return 1
-                channels = [s.channel for s in sequences]
-                channels = sorted(list(set(channels)))
-                empty_channel = channels[-1] + 1
-
-                # Duplicate strip to first empty channel and clear offsets
-                if empty_channel < 33:
-                    bpy.ops.sequencer.select_all(action='DESELECT')
-                    seq.select = True
-                    context.scene.sequence_editor.active_strip = seq # set as active or it won't work
-                    bpy.ops.sequencer.duplicate_move(
-                    SEQUENCER_OT_duplicate={"mode":'TRANSLATION'},
-                    TRANSFORM_OT_seq_slide={
-                    "value":(0, empty_channel-seq.channel),
-                    "snap":False,
-                    "snap_target":'CLOSEST',
-                    "snap_point":(0, 0, 0),
-                    "snap_align":False,
-                    "snap_normal":(0, 0, 0),
-                    "release_confirm":False,
-                    "use_accurate":False},
-                    )
-                    bpy.ops.sequencer.offset_clear()
+            if has_inputs(seq):
+                continue
+
+            start = seq.frame_start
+            end = start + seq.frame_duration
+            channel = empty_channel
+            while channel < 33 and any(s < end and start < e for s, e in placed.get(channel, ())):
+                channel += 1
+
+            if channel > 32:
+                skipped.append(seq.name)
+                continue
+
+            if use_data_api:
+                try:
+                    copy = match_frame_copy(sequences, seq, channel)
+                except RuntimeError:
+                    # Offline or packed media, duplicating still works for those.
+                    copy = self.duplicate_to_channel(context, seq, channel)
+            else:
+                copy = self.duplicate_to_channel(context, seq, channel)
+
+            if copy is None:
+                skipped.append(seq.name)
+            else:
+                placed.setdefault(channel, []).append((start, end))
+
+        invalidate_caches()
 
         #re-select previous selection
         for seq in selection:
             seq.select = True
 
+        if skipped:
+            self.report({'WARNING'}, "No source copy added for: " + ", ".join(skipped))
+
         return {'FINISHED'}
 
+    @staticmethod
+    def duplicate_to_channel(context, seq, channel):
+        # Duplicate strip to channel and clear offsets
+        bpy.ops.sequencer.select_all(action='DESELECT')
+        seq.select = True
+        context.scene.sequence_editor.active_strip = seq # set as active or it won't work
+        bpy.ops.sequencer.duplicate_move(
+        SEQUENCER_OT_duplicate={"mode":'TRANSLATION'},
+        TRANSFORM_OT_seq_slide={
+        "value":(0, channel-seq.channel),
+        "snap":False,
+        "snap_target":'CLOSEST',
+        "snap_point":(0, 0, 0),
+        "snap_align":False,
+        "snap_normal":(0, 0, 0),
+        "release_confirm":False,
+        "use_accurate":False},
+        )
+        bpy.ops.sequencer.offset_clear()
+        return context.scene.sequence_editor.active_strip
+
 
 class SEQUENCER_OT_Split(bpy.types.Operator):
     """Split Unlocked Un/Seleted Strips Soft"""
@@ -763,38 +2457,20 @@ class SEQUENCER_OT_Split(bpy.types.Operator):
 
     def execute(self, context):
         selection = context.selected_sequences
-        sequences = bpy.context.scene.sequence_editor.sequences_all
         cf = bpy.context.scene.frame_current
-        at_cursor = []
-        cut_selected = False
 
         #find unlocked strips at cursor
-        for s in sequences:
-            if s.frame_final_start<=cf and s.frame_final_end > cf:
-                if s.lock == False:
-                    at_cursor.append(s)
-                    if s.select == True:
-                        cut_selected = True
-
-        for s in at_cursor:
-            if cut_selected:
-                if s.select:    #only cut selected
-                    bpy.ops.sequencer.select_all(action='DESELECT')
-                    s.select = True
-                    bpy.ops.sequencer.cut(frame=bpy.context.scene.frame_current, type = self.type, side='RIGHT')
-
-                                # add new strip to selection
-                    for i in bpy.context.scene.sequence_editor.sequences_all:
-                        if i.select: selection.append(i)
-                    bpy.ops.sequencer.select_all(action='DESELECT')
-                    for s in selection: s.select = True
-
-            else:               #cut unselected
-                bpy.ops.sequencer.select_all(action='DESELECT')
-                s.select = True
-                bpy.ops.sequencer.cut(frame=bpy.context.scene.frame_current, type = self.type)
-                bpy.ops.sequencer.select_all(action='DESELECT')
-                for s in selection: s.select = True
+        at_cursor = [s for s in channel_index(context).strips_at_frame(cf) if not s.lock]
+        cut_selected = any(s.select for s in at_cursor)
+        if cut_selected:    #only cut selected
+            at_cursor = [s for s in at_cursor if s.select]
+
+        new_strips = split_strips(context, at_cursor, cf, self.type)
+
+        bpy.ops.sequencer.select_all(action='DESELECT')
+        for s in selection: s.select = True
+        if cut_selected:    # add new strips to selection
+            for s in new_strips: s.select = True
 
         return {'FINISHED'}
 
@@ -816,44 +2492,24 @@ class SEQUENCER_OT_ExtendToFill(bpy.types.Operator):
             return False
 
     def execute(self, context):
-        current_scene = context.scene
-        current_sequence = current_scene.sequence_editor
         selection = context.selected_sequences
-        meta_level = len(current_sequence.meta_stack)
-
-        if meta_level > 0:
-            current_sequence = current_sequence.meta_stack[meta_level - 1]
 
         if not selection:
             return {'CANCELLED'}
 
-        error = False
-        for strip in selection:
-            if strip.lock == False and strip.type not in {
-            'CROSS', 'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-            'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP', 'WIPE', 'GLOW',
-            'TRANSFORM', 'SPEED', 'GAUSSIAN_BLUR', 'COLORMIX',
-            }:
-
-                current_channel = strip.channel
-                current_end = strip.frame_final_end
-                new_end = 300000
-
-                for i in current_sequence.sequences:
-                    next_start = i.frame_final_start
-                    if (i.channel == current_channel and next_start+1 > current_end):
-                        if next_start < new_end:
-                            new_end = next_start
-                if new_end == 300000 and current_end < current_scene.frame_end:
-                    new_end = current_scene.frame_end
-
-                if new_end == 300000 or new_end == current_end:
-                    error = True
-                else:
-                    error = False
-                    strip.frame_final_end = new_end
-
-        if error:
+        timeline = timeline_model(context)
+        extended, failed = sequencer_timeline.extend_to_fill(
+            timeline, [s.name for s in selection], context.scene.frame_end)
+        timeline.apply()
+        invalidate_caches()
+
+        if failed:
+            names = ", ".join(failed[:10])
+            if len(failed) > 10:
+                names += " and %d more" % (len(failed) - 10)
+            self.report({'WARNING'}, "No space to extend: " + names)
+
+        if not extended:
             return {'CANCELLED'}
 
         return {'FINISHED'}
@@ -876,55 +2532,15 @@ class SEQUENCER_OT_Concatenate(bpy.types.Operator):
             return False
 
     def execute(self, context):
-        current_scene = context.scene
-        current_sequence = current_scene.sequence_editor
         selection = context.selected_sequences
-        meta_level = len(current_sequence.meta_stack)
-
-        if meta_level > 0:
-            current_sequence = current_sequence.meta_stack[meta_level - 1]
 
         if not selection:
             return {'CANCELLED'}
 
-        error = False
-        for strip in selection:
-            if strip.lock == False and strip.type not in {
-            'CROSS', 'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-            'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP', 'WIPE', 'GLOW',
-            'TRANSFORM', 'SPEED', 'GAUSSIAN_BLUR', 'COLORMIX',
-            }:
-
-                current_channel = strip.channel
-                current_end = strip.frame_final_end
-                new_end = 300000
-
-                for i in current_sequence.sequences:
-                    next_start = i.frame_final_start
-                    if (i.channel == current_channel and next_start-1 > current_end):
-                        if next_start < new_end:
-                            new_end = next_start
-                if new_end == 300000 and current_end < current_scene.frame_end:
-                    new_end = current_scene.frame_end
-
-                if new_end == 300000 or new_end == current_end:
-                    error = True
-                else:
-                    # Add color strips in gaps and use ripple delete to extract them
-                    error = False
-                    bpy.ops.sequencer.select_all(action='DESELECT')
-                    bpy.ops.sequencer.effect_strip_add(
-                        frame_start=current_end+1,
-                        frame_end=new_end,
-                        channel=current_channel,
-                        type='COLOR',
-                        )
-                    bpy.ops.sequencer.ripple_delete()
+        strips = [s for s in selection if s.lock == False and not has_inputs(s)]
+        closed = close_gaps(context, strips)
 
-        bpy.ops.sequencer.select_all(action='DESELECT')
-        for s in selection: s.select = True
-
-        if error:
+        if not closed:
             return {'CANCELLED'}
 
         return {'FINISHED'}
@@ -936,6 +2552,16 @@ class SEQUENCER_OT_SplitMode(bpy.types.Operator):
     bl_idname = "sequencer.split_mode"
     bl_label = "Split Mode..."
 
+    update_rate: FloatProperty(
+        name="Update Rate",
+        description="Maximum number of playhead updates per second while scrubbing",
+        min=1.0, max=240.0,
+        default=30.0,
+    )
+
+    _timer = None
+    _mouse_position = None
+
     @classmethod
     def poll(cls, context):
         current_scene = context.scene
@@ -944,49 +2570,418 @@ class SEQUENCER_OT_SplitMode(bpy.types.Operator):
         else:
             return False
 
-    def execute(self, context):
+    def _apply_mouse_position(self, context):
+        # Only the latest mouse position is kept between updates,
+        # and the scene is only evaluated when the frame changes.
+        if self._mouse_position is None:
+            return
+
         region = context.region
-        x, y = region.view2d.region_to_view(*self.mouse_path[-1] )
-        context.scene.frame_set(x)
+        x, y = region.view2d.region_to_view(*self._mouse_position)
+        self._mouse_position = None
+
+        frame = round(x)
+        if frame != context.scene.frame_current:
+            context.scene.frame_set(frame)
+            context.area.tag_redraw()
 
     def modal(self, context, event):
-        context.area.tag_redraw()
-        region = context.region
 
         if event.type == 'MOUSEMOVE':
-            self.mouse_path.append((event.mouse_region_x, event.mouse_region_y))
-            self.execute(context)
+            self._mouse_position = (event.mouse_region_x, event.mouse_region_y)
+
+        elif event.type == 'TIMER':
+            self._apply_mouse_position(context)
 
         elif event.type == 'LEFTMOUSE' and event.value == 'PRESS':
 
+            self._apply_mouse_position(context)
             bpy.ops.sequencer.split(type = 'SOFT')
+            context.area.tag_redraw()
 
         elif event.type in {'RIGHTMOUSE', 'ESC'}:
 
+            self.cancel(context)
             return {'FINISHED'}
 
         return {'RUNNING_MODAL'}
 
     def invoke(self, context, event):
 
-        args = (self, context)
-        self.mouse_path = []
-        context.window_manager.modal_handler_add(self)
+        wm = context.window_manager
+        self._mouse_position = None
+        self._timer = wm.event_timer_add(1.0 / self.update_rate, window=context.window)
+        wm.modal_handler_add(self)
         return {'RUNNING_MODAL'}
 
+    def cancel(self, context):
+        # Also called when the modal is ended by a file load or a closed window.
+        if self._timer is not None:
+            context.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+
+
+class SEQUENCER_OT_RebuildProxyStale(bpy.types.Operator):
+    """Rebuild only the proxies whose source or build settings changed since they were built"""
+
+    bl_idname = "sequencer.rebuild_proxy_stale"
+    bl_label = "Rebuild Stale Proxies"
+    bl_options = {'REGISTER'}
+
+    selected_only: BoolProperty(
+        name="Selected Only",
+        description="Only check the proxies of the selected strips",
+        default=False,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene and context.scene.sequence_editor
+
+    def execute(self, context):
+        ed = context.scene.sequence_editor
+        strips = proxy_strips(ed, self.selected_only)
+        stale = stale_proxy_strips(ed, strips)
+
+        if not stale:
+            self.report({'INFO'}, "All %d proxies are up to date" % len(strips))
+            return {'CANCELLED'}
+
+        selected = [s for s in ed.sequences_all if s.select]
+        overwrite = [(s, s.proxy.use_overwrite) for s in stale]
+
+        for s in selected:
+            s.select = False
+        for s in stale:
+            s.select = True
+            s.proxy.use_overwrite = True
+
+        bpy.ops.sequencer.rebuild_proxy()
+
+        for s, use_overwrite in overwrite:
+            s.proxy.use_overwrite = use_overwrite
+            s.select = False
+        for s in selected:
+            s.select = True
+
+        record_proxies(ed, stale)
+        self.report({'INFO'}, "Rebuilt %d of %d proxies" % (len(stale), len(strips)))
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_ProxyUseSharedCache(bpy.types.Operator):
+    """Store the proxies of movie and image strips in the proxy cache shared by all projects"""
+
+    bl_idname = "sequencer.proxy_use_shared_cache"
+    bl_label = "Use Shared Proxy Cache"
+    bl_description = ("Point the proxy directory of each strip at the shared cache entry of its source "
+                      "content and build settings, run again after changing the settings")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    selected_only: BoolProperty(
+        name="Selected Only",
+        description="Only change the selected strips",
+        default=True,
+    )
+    max_size: StringProperty(
+        name="Cache Size Limit",
+        description="Remove the least recently used cache entries above this size, like 500G. Empty for no limit",
+        default="",
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene and context.scene.sequence_editor
 
-classes = (
+    def execute(self, context):
+        ed = context.scene.sequence_editor
+        strips = [
+            s for s in ed.sequences_all
+            if s.type in {'MOVIE', 'IMAGE'} and (s.select or not self.selected_only)
+        ]
+        if not strips:
+            self.report({'WARNING'}, "No movie or image strips")
+            return {'CANCELLED'}
+
+        try:
+            max_bytes = sequencer_media.parse_size(self.max_size) if self.max_size.strip() else None
+        except ValueError:
+            self.report({'ERROR'}, "Invalid cache size limit: " + self.max_size)
+            return {'CANCELLED'}
+
+        cache = sequencer_media.ProxyCache()
+        moved = []
+        failed = []
+        for s in strips:
+            use_proxy = s.use_proxy
+            if not use_proxy:
+                s.use_proxy = True
+            try:
+                moved.append((s, cache.use(strip_proxy_source(s), proxy_settings(s))))
+            except OSError:
+                # Not moved, so left as it was.
+                s.use_proxy = use_proxy
+                failed.append(s.name)
+
+        if ed.proxy_storage == 'PROJECT' and moved:
+            # Per strip directories are ignored with project storage. The
+            # strips not moved to the cache keep finding their proxies in
+            # the project directory, as their own directory.
+            project_dir = ed.proxy_dir or "//BL_proxy"
+            names = {s.name for s, _directory in moved}
+            for s in proxy_strips(ed):
+                if s.name not in names:
+                    s.proxy.use_proxy_custom_directory = True
+                    s.proxy.directory = project_dir
+            ed.proxy_storage = 'PER_STRIP'
+
+        directories = []
+        for s, directory in moved:
+            s.proxy.use_proxy_custom_directory = True
+            s.proxy.directory = directory + os.sep
+            directories.append(directory)
+
+        if max_bytes is not None:
+            cache.prune(max_bytes, keep=directories)
+        _stale_count.clear()
+
+        if failed:
+            self.report({'WARNING'}, "Source files not readable: " + ", ".join(failed[:10]))
+        self.report({'INFO'}, "%d strips use the proxy cache in %s" % (len(directories), cache.root))
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_ProxyBuildParallel(bpy.types.Operator):
+    """Build the proxies of movie and image strips with several background Blender processes"""
+
+    bl_idname = "sequencer.proxy_build_parallel"
+    bl_label = "Build Proxies in Parallel"
+    bl_options = {'REGISTER'}
+
+    selected_only: BoolProperty(
+        name="Selected Only",
+        description="Only build proxies of the selected strips",
+        default=True,
+    )
+    workers: IntProperty(
+        name="Workers",
+        description="Number of Blender processes building proxies at the same time",
+        min=1, max=64,
+        default=max(1, (os.cpu_count() or 2) // 2),
+    )
+    restart: BoolProperty(
+        name="Restart",
+        description="Start a new queue instead of resuming the unfinished one of this file",
+        default=False,
+    )
+    stale_only: BoolProperty(
+        name="Stale Only",
+        description="Only rebuild proxies the proxy manifest lists as missing or out of date",
+        default=False,
+    )
+
+    _timer = None
+    _processes = None
+    _queue_path = ""
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene and context.scene.sequence_editor and not ProxyBuildState.running
+
+    def invoke(self, context, event):
+        if not bpy.data.filepath or bpy.data.is_dirty:
+            self.report({'ERROR'}, "Save the file first, the workers build the proxies from the saved file")
+            return {'CANCELLED'}
+
+        self._queue_path = proxy_queue_path(bpy.data.filepath)
+        queue = [] if self.restart else load_proxy_queue(self._queue_path)
+
+        if any(entry["status"] != 'DONE' for entry in queue):
+            # Resume: strips running or failed when the build stopped start over.
+            for entry in queue:
+                if entry["status"] != 'DONE':
+                    entry["status"] = 'PENDING'
+                    entry.pop("started", None)
+        else:
+            ed = context.scene.sequence_editor
+            # Like rebuild_proxy, only strips with proxies enabled are built.
+            strips = [
+                s for s in ed.sequences_all
+                if s.type in {'MOVIE', 'IMAGE'} and s.use_proxy and s.proxy and
+                (s.select or not self.selected_only)
+            ]
+            if self.stale_only:
+                strips = stale_proxy_strips(ed, strips)
+            queue = [{"strip": s.name, "status": 'PENDING', "seconds": 0.0} for s in strips]
+
+        if not queue:
+            self.report({'WARNING'}, "No movie or image strips with proxies enabled")
+            return {'CANCELLED'}
+
+        try:
+            save_proxy_queue(self._queue_path, queue)
+        except OSError as ex:
+            self.report({'ERROR'}, str(ex))
+            return {'CANCELLED'}
+
+        ProxyBuildState.running = True
+        ProxyBuildState.queue = queue
+        self._processes = {}
+
+        wm = context.window_manager
+        wm.progress_begin(0, len(queue))
+        self._timer = wm.event_timer_add(0.5, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            self.report({'INFO'}, "Proxy build stopped, run it again to resume")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        queue = ProxyBuildState.queue
+        changed = False
+        for entry in queue:
+            process = self._processes.get(entry["strip"])
+            if process is None or process.poll() is None:
+                continue
+            del self._processes[entry["strip"]]
+            entry["status"] = 'DONE' if process.returncode == 0 else 'FAILED'
+            entry["seconds"] = time.time() - entry.pop("started")
+            changed = True
+            if entry["status"] == 'DONE':
+                ed = context.scene.sequence_editor
+                strip = ed.sequences_all.get(entry["strip"])
+                if strip is not None and strip.proxy:
+                    record_proxies(ed, [strip])
+
+        for entry in queue:
+            if len(self._processes) >= self.workers:
+                break
+            if entry["status"] == 'PENDING':
+                self._processes[entry["strip"]] = subprocess.Popen(
+                    proxy_worker_command(bpy.data.filepath, [entry["strip"]], overwrite=self.stale_only),
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                entry["status"] = 'RUNNING'
+                entry["started"] = time.time()
+                changed = True
+
+        if changed:
+            save_proxy_queue(self._queue_path, queue)
+            context.window_manager.progress_update(sum(1 for e in queue if e["status"] in {'DONE', 'FAILED'}))
+            for area in context.screen.areas:
+                if area.type == 'SEQUENCE_EDITOR':
+                    area.tag_redraw()
+
+        if not self._processes:
+            failed = [e["strip"] for e in queue if e["status"] == 'FAILED']
+            self.finish(context)
+            if failed:
+                self.report({'WARNING'}, "Proxy build failed for: " + ", ".join(failed))
+                return {'CANCELLED'}
+            self.report({'INFO'}, "Built proxies of %d strips" % len(queue))
+            return {'FINISHED'}
+
+        return {'PASS_THROUGH'}
+
+    def finish(self, context):
+        queue = ProxyBuildState.queue
+        for entry in queue:
+            process = self._processes.pop(entry["strip"], None)
+            if process is not None:
+                process.terminate()
+                process.wait()
+                entry["status"] = 'PENDING'
+                entry.pop("started", None)
+        save_proxy_queue(self._queue_path, queue)
+
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        ProxyBuildState.running = False
+
+    def cancel(self, context):
+        self.finish(context)
+
+
+class SEQUENCER_OT_ProfilingToggle(bpy.types.Operator):
+    """Start or stop profiling the sequencer operators"""
+
+    bl_idname = "sequencer.profiling_toggle"
+    bl_label = "Toggle Operator Profiling"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        if OperatorProfiler.enabled:
+            OperatorProfiler.disable()
+        else:
+            OperatorProfiler.enable(profiled_classes)
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_ProfilingClear(bpy.types.Operator):
+    """Forget the recorded operator profiles"""
+
+    bl_idname = "sequencer.profiling_clear"
+    bl_label = "Clear Operator Profiles"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        OperatorProfiler.clear()
+        return {'FINISHED'}
+
+
+class SEQUENCER_OT_ProfilingDump(bpy.types.Operator):
+    """Write the recorded operator profiles to a JSON file"""
+
+    bl_idname = "sequencer.profiling_dump"
+    bl_label = "Save Operator Profiles"
+    bl_options = {'REGISTER'}
+
+    filepath: StringProperty(
+        subtype='FILE_PATH',
+    )
+    filter_glob: StringProperty(
+        default="*.json",
+        options={'HIDDEN'},
+    )
+
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = "sequencer_profile.json"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        try:
+            with open(bpy.path.abspath(self.filepath), "w") as f:
+                json.dump(OperatorProfiler.as_dict(), f, indent=2, sort_keys=True)
+        except OSError as ex:
+            self.report({'ERROR'}, str(ex))
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+
+profiled_classes = (
     SEQUENCER_OT_CrossfadeSounds,
     SEQUENCER_OT_CutMulticam,
+    SEQUENCER_OT_CutMulticamList,
     SEQUENCER_OT_DeinterlaceSelectedMovies,
     SEQUENCER_OT_ReverseSelectedMovies,
     SEQUENCER_OT_FlipXSelectedMovies,
     SEQUENCER_OT_FlipYSelectedMovies,
     SEQUENCER_OT_ShowWaveformSelectedSounds,
+    SEQUENCER_OT_BulkSet,
     SEQUENCER_OT_SelectCurrentFrame,
     SEQUENCER_OT_SelectChannelStrips,
     SEQUENCER_OT_SelectLockedStrips,
     SEQUENCER_OT_SelectMuteStrips,
+    SEQUENCER_OT_SelectQuery,
     SEQUENCER_OT_AudioMuteToggle,
     SEQUENCER_OT_SetPreviewRange,
     SEQUENCER_OT_PreviewSelected,
@@ -1000,4 +2995,41 @@ classes = (
     SEQUENCER_OT_Move,
     SEQUENCER_OT_Concatenate,
     SEQUENCER_OT_SplitMode,
+    SEQUENCER_OT_RebuildProxyStale,
+    SEQUENCER_OT_ProxyUseSharedCache,
+    SEQUENCER_OT_ProxyBuildParallel,
 )
+
+classes = profiled_classes + (
+    SEQUENCER_OT_ProfilingToggle,
+    SEQUENCER_OT_ProfilingClear,
+    SEQUENCER_OT_ProfilingDump,
+)
+
+
+# Handlers of this module, in bpy.app.handlers lists.
+_handlers = (
+    ("load_post", probe_project_media),
+    ("load_post", load_waveform_peaks),
+)
+
+
+def register():
+    """Add the handlers of this module, replacing the ones of an earlier load of it"""
+    for name, handler in _handlers:
+        handlers = getattr(bpy.app.handlers, name)
+        for old in [h for h in handlers if h.__name__ == handler.__name__]:
+            handlers.remove(old)
+        handlers.append(handler)
+
+
+def unregister():
+    """Remove the handlers of this module and the waveform peak drawing"""
+    global _peak_draw_handle
+    for name, handler in _handlers:
+        handlers = getattr(bpy.app.handlers, name)
+        for old in [h for h in handlers if h.__name__ == handler.__name__]:
+            handlers.remove(old)
+    if _peak_draw_handle is not None:
+        bpy.types.SpaceSequenceEditor.draw_handler_remove(_peak_draw_handle, 'WINDOW')
+        _peak_draw_handle = None
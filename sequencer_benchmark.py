@@ -0,0 +1,272 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Time every operator of bl_operators/sequencer.py on synthetic timelines.
+
+Run with the reworked sequencer.py installed:
+
+    blender --background --factory-startup --python sequencer_benchmark.py -- \\
+        --sizes 1000 10000 50000 --output results.json
+
+and compare against an earlier run, exiting with status 1 on regressions:
+
+    blender --background --factory-startup --python sequencer_benchmark.py -- \\
+        --output new.json --compare results.json --threshold 1.25
+
+Each timeline is built once per size and saved to a temporary .blend file,
+which is reloaded before every timed run so all operators start from the
+same strips.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import bpy
+from bl_operators import sequencer
+
+
+# Channels 1-28 hold color strips, 29 transform effects, 30 cross effects,
+# 31 a multicam strip spanning the whole timeline, 32 is left free.
+STRIP_CHANNELS = 28
+STRIP_LENGTH = 20
+STRIP_GAP = 5
+
+# Operators which only run interactively.
+SKIPPED = {"sequencer.split_mode"}
+
+# Properties passed to operators, the defaults are used for the others.
+PROPERTIES = {
+    "sequencer.select_query": {"expression": "channel in [2, 10] and frame in [100, 2000] and not lock"},
+    "sequencer.bulk_set": {"assignments": "use_flip_x=toggle, blend_alpha=0.5", "types": "COLOR"},
+    "sequencer.cut_multicam": {"camera": 3},
+}
+
+# Operators working on the active strip, mapped to the strip type to make active.
+ACTIVE_TYPE = {
+    "sequencer.cut_multicam": 'MULTICAM',
+    "sequencer.cut_multicam_list": 'MULTICAM',
+}
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="sequencer_benchmark.py", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="number of strips of each timeline")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per operator, the fastest one is reported")
+    parser.add_argument("--output", default="sequencer_benchmark.json",
+                        help="JSON file to write the results to")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown factor counted as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="seconds an operator must slow down by to count as a regression")
+    return parser.parse_args(argv)
+
+
+def sequencer_override():
+    """Context override with an area turned into a sequencer timeline"""
+    window = bpy.context.window_manager.windows[0]
+    area = max(window.screen.areas, key=lambda a: a.width * a.height)
+    area.type = 'SEQUENCE_EDITOR'
+    area.spaces.active.view_type = 'SEQUENCER'
+    region = next(r for r in area.regions if r.type == 'WINDOW')
+    return {
+        "window": window,
+        "screen": window.screen,
+        "area": area,
+        "region": region,
+        "scene": bpy.context.scene,
+    }
+
+
+def build_timeline(size):
+    """Fill the scene with about size strips, effects, metas and locked strips"""
+    scene = bpy.context.scene
+    ed = scene.sequence_editor_create()
+    sequences = ed.sequences
+
+    per_channel = max(1, size // STRIP_CHANNELS)
+    step = STRIP_LENGTH + STRIP_GAP
+    for channel in range(1, STRIP_CHANNELS + 1):
+        # Channel 2 overlaps channel 1 for the cross effects.
+        offset = STRIP_LENGTH // 2 if channel == 2 else 0
+        for i in range(per_channel):
+            start = 1 + offset + i * step
+            strip = sequences.new_effect(
+                "c%d_%d" % (channel, i), 'COLOR', channel, start, frame_end=start + STRIP_LENGTH)
+            strip.lock = i % 10 == 9
+            strip.mute = i % 25 == 24
+
+    by_name = {s.name: s for s in sequences}
+    effects = max(1, size // 100)
+    for i in range(0, min(effects, per_channel)):
+        source = by_name["c1_%d" % i]
+        sequences.new_effect(
+            "t%d" % i, 'TRANSFORM', 29, source.frame_final_start, seq1=source)
+        other = by_name["c2_%d" % i]
+        sequences.new_effect(
+            "x%d" % i, 'CROSS', 30, other.frame_final_start,
+            frame_end=source.frame_final_end, seq1=source, seq2=other)
+
+    end = 1 + per_channel * step
+    multicam = sequences.new_effect("multicam", 'MULTICAM', 31, 1, frame_end=end)
+    multicam.multicam_source = 1
+    for frame in range(1, end, 500):
+        scene.timeline_markers.new("Cam %d" % (1 + frame // 500 % 4), frame=frame)
+
+    scene.frame_start = 1
+    scene.frame_end = end
+    scene.frame_current = end // 2
+
+    # Group a few runs of strips on the last strip channel into meta strips.
+    override = sequencer_override()
+    for i in range(0, min(per_channel, max(1, size // 1000) * 10), 10):
+        bpy.ops.sequencer.select_all(override, action='DESELECT')
+        for j in range(i, min(i + 3, per_channel)):
+            strip = by_name["c%d_%d" % (STRIP_CHANNELS, j)]
+            if not strip.lock:
+                strip.select = True
+        bpy.ops.sequencer.meta_make(override)
+
+    return len(ed.sequences_all)
+
+
+def prepare_selection(idname):
+    """Select every seventh unlocked strip and pick the active strip"""
+    scene = bpy.context.scene
+    ed = scene.sequence_editor
+    active = None
+    wanted = ACTIVE_TYPE.get(idname, 'COLOR')
+    for i, s in enumerate(ed.sequences):
+        s.select = i % 7 == 0 and not s.lock
+        if s.type == wanted and (active is None or
+                                 s.frame_final_start <= scene.frame_current < s.frame_final_end):
+            active = s
+    ed.active_strip = active
+
+
+def benchmark_operator(cls, blend_path, repeat):
+    idname = cls.bl_idname
+    module, name = idname.split(".")
+    op = getattr(getattr(bpy.ops, module), name)
+    props = PROPERTIES.get(idname, {})
+
+    times = []
+    status = None
+    for _ in range(repeat):
+        bpy.ops.wm.open_mainfile(filepath=blend_path)
+        override = sequencer_override()
+        prepare_selection(idname)
+        sequencer.invalidate_caches()
+
+        if not op.poll(override):
+            return {"status": "POLL_FAILED"}
+        start = time.perf_counter()
+        try:
+            status = op(override, 'EXEC_DEFAULT', **props)
+        except RuntimeError as ex:
+            return {"status": "ERROR", "error": str(ex).strip()}
+        times.append(time.perf_counter() - start)
+
+    return {
+        "status": "/".join(sorted(status)),
+        "seconds": min(times),
+        "runs": times,
+    }
+
+
+def run(args):
+    results = {
+        "blender": bpy.app.version_string,
+        "sizes": args.sizes,
+        "results": {},
+    }
+    blend_path = os.path.join(tempfile.gettempdir(), "sequencer_benchmark_%d.blend" % os.getpid())
+
+    try:
+        for size in args.sizes:
+            bpy.ops.wm.read_factory_settings(use_empty=True)
+            start = time.perf_counter()
+            strips = build_timeline(size)
+            print("Built %d strips in %.2fs" % (strips, time.perf_counter() - start))
+            bpy.ops.wm.save_as_mainfile(filepath=blend_path)
+
+            size_results = results["results"][str(size)] = {"strips": strips, "operators": {}}
+            for cls in sequencer.profiled_classes:
+                idname = cls.bl_idname
+                if idname in SKIPPED or not hasattr(cls, "execute"):
+                    continue
+                result = benchmark_operator(cls, blend_path, args.repeat)
+                size_results["operators"][idname] = result
+                if "seconds" in result:
+                    print("%6d  %-45s %9.4fs  %s" % (size, idname, result["seconds"], result["status"]))
+                else:
+                    print("%6d  %-45s %10s  %s" % (size, idname, "-", result["status"]))
+    finally:
+        if os.path.exists(blend_path):
+            os.remove(blend_path)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print("Wrote", args.output)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Print the operators slower than baseline by threshold and return them"""
+    regressions = []
+    for size, size_results in results["results"].items():
+        base_operators = baseline.get("results", {}).get(size, {}).get("operators", {})
+        for idname, result in size_results["operators"].items():
+            base = base_operators.get(idname, {})
+            if "seconds" not in result or "seconds" not in base:
+                continue
+            seconds, base_seconds = result["seconds"], base["seconds"]
+            if seconds > base_seconds * threshold and seconds - base_seconds > min_delta:
+                regressions.append((int(size), idname, base_seconds, seconds))
+
+    for size, idname, base_seconds, seconds in sorted(regressions):
+        print("REGRESSION %6d  %-45s %9.4fs -> %9.4fs (x%.2f)" % (
+            size, idname, base_seconds, seconds, seconds / max(base_seconds, 1e-9)))
+    if not regressions:
+        print("No regressions against the baseline")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold, args.min_delta):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
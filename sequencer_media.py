@@ -0,0 +1,531 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Media bookkeeping for the sequencer, independent of bpy.
+
+Source files are identified by a hash of their size and a few sampled
+blocks, cheap enough for camera cards of hundreds of gigabytes, image
+sequences by the names, sizes and mtimes of their images. The proxy
+manifest records which source and build settings each proxy was built
+from, so rebuilds can skip the proxies that are still up to date. The
+proxy cache shares proxies between projects, keyed by source content.
+The media index keeps what ffprobe found out about media files, so panels
+don't have to wait for a decoded frame to show a resolution.
+
+Run as a script to inspect or prune the proxy cache:
+
+    python sequencer_media.py cache list
+    python sequencer_media.py cache prune --max-size 500G
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+SAMPLE_SIZE = 1 << 20
+SAMPLE_COUNT = 4
+
+
+def sample_hash(path, sample_size=SAMPLE_SIZE, samples=SAMPLE_COUNT):
+    """
+    Hex digest of the size of a file and samples blocks of sample_size
+    bytes spread evenly over it, the whole file when it is smaller.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= sample_size * samples:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        else:
+            step = (size - sample_size) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+def source_files(source):
+    """
+    The files of a source: a file path, or a list of the paths of the
+    images of an image sequence.
+    """
+    return [source] if isinstance(source, str) else source
+
+
+def source_name(source):
+    """Name of a source in manifests and cache entries"""
+    if isinstance(source, str):
+        return source
+    return "%s..%s" % (source[0], os.path.basename(source[-1]))
+
+
+def source_stat(source):
+    """(bytes, newest mtime) of the files of a source, raises OSError when one is missing"""
+    size = 0
+    mtime = 0.0
+    for path in source_files(source):
+        stat = os.stat(path)
+        size += stat.st_size
+        mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+def source_hash(source):
+    """
+    Hex digest identifying a source: the sample_hash of a file, for an
+    image sequence a hash of its directory and the name, size and mtime of
+    every image, so a re-rendered frame anywhere changes it.
+    """
+    if isinstance(source, str):
+        return sample_hash(source)
+    digest = hashlib.blake2b(os.path.dirname(source[0]).encode(), digest_size=16)
+    for path in source:
+        stat = os.stat(path)
+        digest.update(("\0%s\0%d\0%r" % (os.path.basename(path), stat.st_size, stat.st_mtime)).encode())
+    return digest.hexdigest()
+
+
+def write_json(path, data):
+    """Write data to the JSON file path through a temporary file, so readers never see half a file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class ProxyManifest:
+    """
+    Sources and build settings of the proxies in one proxy directory,
+    stored as proxy_manifest.json in it.
+    """
+    filename = "proxy_manifest.json"
+    version = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, self.filename)
+        self.entries = {}
+        # True when entries changed since the manifest was read or saved.
+        self.changed = False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == self.version:
+                self.entries = data["proxies"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        write_json(self.path, {"version": self.version, "proxies": self.entries})
+        self.changed = False
+
+    def is_stale(self, source, settings, check_hash=True):
+        """
+        True when the proxy of source is missing from the manifest or from
+        the disk, was built with other settings, or the source changed since.
+        A source with a new size or mtime only counts as changed when its
+        hash differs, unless check_hash is off. See source_files() for what
+        a source is.
+        """
+        entry = self.entries.get(source_name(source))
+        if entry is None or entry["settings"] != settings:
+            return True
+        if not all(os.path.exists(path) for path in entry.get("outputs", ())):
+            return True
+        try:
+            size, mtime = source_stat(source)
+        except OSError:
+            return True
+        if size == entry["size"] and mtime == entry["mtime"]:
+            return False
+        if not check_hash or size != entry["size"]:
+            return True
+        if source_hash(source) != entry["hash"]:
+            return True
+        # Touched but unchanged, remember the new mtime once saved.
+        entry["mtime"] = mtime
+        self.changed = True
+        return False
+
+    def record(self, source, settings, outputs=()):
+        """
+        Remember that the proxy of source was built with settings, into the
+        files outputs, which is_stale() checks for.
+        """
+        size, mtime = source_stat(source)
+        self.entries[source_name(source)] = {
+            "size": size,
+            "mtime": mtime,
+            "hash": source_hash(source),
+            "settings": settings,
+            "outputs": list(outputs),
+        }
+        self.changed = True
+
+
+def cache_root():
+    """
+    Root directory of the shared proxy cache: $SEQUENCER_PROXY_CACHE, else
+    blender_vse_proxies in $XDG_CACHE_HOME or ~/.cache.
+    """
+    root = os.environ.get("SEQUENCER_PROXY_CACHE")
+    if root:
+        return root
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "blender_vse_proxies")
+
+
+def parse_size(text):
+    """Bytes of a size like 500G, 20M or 1024"""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return "%.1f%s" % (size, unit)
+        size /= 1024
+    return "%.1fT" % size
+
+
+class ProxyCache:
+    """
+    Proxy directories shared between projects, one per source content and
+    build settings, with least recently used entries removed first.
+
+    Each entry directory holds entry.json with the source it was made for;
+    its mtime is the last time the entry was used.
+    """
+    info_name = "entry.json"
+
+    def __init__(self, root=None):
+        self.root = root or cache_root()
+
+    @staticmethod
+    def key(source, settings):
+        """
+        Cache key of source built with settings; the proxy sizes share one
+        entry. See source_files() for what a source is.
+        """
+        shared = {name: value for name, value in settings.items() if name != "sizes"}
+        digest = hashlib.blake2b(source_hash(source).encode(), digest_size=16)
+        digest.update(json.dumps(shared, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def directory(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def use(self, source, settings):
+        """Directory of the entry for source, created or marked as just used"""
+        key = self.key(source, settings)
+        directory = self.directory(key)
+        info_path = os.path.join(directory, self.info_name)
+        if os.path.exists(info_path):
+            os.utime(info_path)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            write_json(info_path, {
+                "key": key, "source": source_name(source), "settings": settings, "created": time.time(),
+            })
+        return directory
+
+    def entries(self):
+        """(key, directory, bytes, last used, source) of every entry"""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                directory = os.path.join(prefix_dir, key)
+                info_path = os.path.join(directory, self.info_name)
+                try:
+                    last_used = os.path.getmtime(info_path)
+                    with open(info_path) as f:
+                        source = json.load(f).get("source", "")
+                except (OSError, ValueError):
+                    continue
+                size = 0
+                for dirpath, _dirnames, filenames in os.walk(directory):
+                    for filename in filenames:
+                        try:
+                            size += os.path.getsize(os.path.join(dirpath, filename))
+                        except OSError:
+                            pass
+                found.append((key, directory, size, last_used, source))
+        return found
+
+    def prune(self, max_bytes, keep=()):
+        """
+        Remove least recently used entries until the cache is at most
+        max_bytes, never the directories in keep. Returns the removed entries.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[3])
+        total = sum(entry[2] for entry in entries)
+        keep = {os.path.normpath(directory) for directory in keep}
+        removed = []
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            if os.path.normpath(entry[1]) in keep:
+                continue
+            shutil.rmtree(entry[1], ignore_errors=True)
+            total -= entry[2]
+            removed.append(entry)
+        return removed
+
+
+def media_index_path():
+    """The global media index: $SEQUENCER_MEDIA_INDEX, else next to the proxy cache"""
+    path = os.environ.get("SEQUENCER_MEDIA_INDEX")
+    if path:
+        return path
+    return os.path.join(os.path.dirname(cache_root()), "blender_vse_media.sqlite")
+
+
+_media_fields = (
+    "width", "height", "fps", "duration", "codec", "gop",
+    "audio_codec", "audio_channels", "sample_rate",
+)
+
+
+def _fraction(text):
+    try:
+        numerator, _sep, denominator = text.partition("/")
+        value = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def probe_media(path, ffprobe="ffprobe", gop_packets=300):
+    """
+    Properties of a media file read with ffprobe, a dict with the keys of
+    _media_fields, None for the ones not found. Raises OSError when ffprobe
+    can't be run.
+    """
+    info = dict.fromkeys(_media_fields)
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False,
+    )
+    try:
+        data = json.loads(result.stdout.decode("utf-8", "replace") or "{}")
+    except ValueError:
+        return info
+
+    video = audio = None
+    for stream in data.get("streams", ()):
+        if stream.get("codec_type") == 'video' and video is None:
+            video = stream
+        elif stream.get("codec_type") == 'audio' and audio is None:
+            audio = stream
+
+    duration = data.get("format", {}).get("duration")
+    if duration is not None:
+        info["duration"] = float(duration)
+
+    if video is not None:
+        info["width"] = video.get("width")
+        info["height"] = video.get("height")
+        info["codec"] = video.get("codec_name")
+        info["fps"] = _fraction(video.get("avg_frame_rate") or video.get("r_frame_rate") or "")
+        info["gop"] = _probe_gop(path, ffprobe, gop_packets) if info["fps"] else None
+    if audio is not None:
+        info["audio_codec"] = audio.get("codec_name")
+        info["audio_channels"] = audio.get("channels")
+        info["sample_rate"] = int(audio["sample_rate"]) if audio.get("sample_rate") else None
+    return info
+
+
+def _probe_gop(path, ffprobe, packets):
+    # Distance between the first two key frames among the first video packets.
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "v:0", "-read_intervals", "%%+#%d" % packets,
+         "-show_entries", "packet=flags", "-of", "csv=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False,
+    )
+    keys = [i for i, flags in enumerate(result.stdout.decode("ascii", "replace").split()) if "K" in flags]
+    return keys[1] - keys[0] if len(keys) > 1 else None
+
+
+class MediaIndex:
+    """
+    Probed properties of media files, stored in an SQLite database and keyed
+    by path, mtime and size: a changed file is probed again.
+
+    refresh() probes files in a thread pool; the threads only stat and run
+    ffprobe, collect() stores their results from the calling thread.
+    """
+
+    def __init__(self, path=None, workers=4):
+        self.path = path or media_index_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, mtime REAL, size INTEGER, %s)"
+            % ", ".join(_media_fields))
+        self.workers = workers
+        # Blender doesn't ship ffprobe, it has to be on the PATH.
+        self.ffprobe = shutil.which("ffprobe")
+        self._pool = None
+        self._pending = {}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.db.close()
+
+    def _row(self, path):
+        return self.db.execute(
+            "SELECT mtime, size, %s FROM media WHERE path = ?" % ", ".join(_media_fields), (path,)).fetchone()
+
+    def get(self, path):
+        """The stored properties of path, None when it was not probed since it last changed"""
+        row = self._row(path)
+        if row is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if (stat.st_mtime, stat.st_size) != tuple(row[:2]):
+            return None
+        return dict(zip(_media_fields, row[2:]))
+
+    def put(self, path, mtime, size, info):
+        self.db.execute(
+            "INSERT OR REPLACE INTO media VALUES (?, ?, ?, %s)" % ", ".join("?" * len(_media_fields)),
+            (path, mtime, size) + tuple(info.get(field) for field in _media_fields))
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def is_pending(self, path):
+        return path in self._pending
+
+    def refresh(self, paths):
+        """
+        Probe in the background the paths not in the index or changed since.
+        Nothing is probed when ffprobe isn't found, see the ffprobe attribute.
+        """
+        if self.ffprobe is None:
+            return 0
+        paths = [path for path in set(paths) if path not in self._pending]
+        known = {}
+        # Only the rows of paths, in batches below the SQLite variable limit.
+        for i in range(0, len(paths), 500):
+            batch = paths[i:i + 500]
+            rows = self.db.execute(
+                "SELECT path, mtime, size FROM media WHERE path IN (%s)" % ", ".join("?" * len(batch)), batch)
+            known.update((path, (mtime, size)) for path, mtime, size in rows)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        for path in paths:
+            self._pending[path] = self._pool.submit(self._probe, path, known.get(path))
+        return len(paths)
+
+    def _probe(self, path, known):
+        # Runs in the pool: None when path is missing or unchanged.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if known == (stat.st_mtime, stat.st_size):
+            return None
+        try:
+            info = probe_media(path, self.ffprobe)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size, info)
+
+    def collect(self):
+        """Store the finished probes, returns how many were stored"""
+        stored = 0
+        for path, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[path]
+            result = future.result()
+            if result is not None:
+                self.put(path, *result)
+                stored += 1
+        if stored:
+            self.db.commit()
+        return stored
+
+
+def _cache_command(args):
+    cache = ProxyCache(args.root)
+    if args.action == "list":
+        entries = sorted(cache.entries(), key=lambda entry: entry[3], reverse=True)
+        for key, _directory, size, last_used, source in entries:
+            print("%s  %8s  %s  %s" % (
+                key, format_size(size), time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used)), source))
+        print("%d entries, %s in %s" % (len(entries), format_size(sum(e[2] for e in entries)), cache.root))
+    elif args.action == "prune":
+        removed = cache.prune(args.max_bytes)
+        for key, _directory, size, _last_used, source in removed:
+            print("removed %s  %8s  %s" % (key, format_size(size), source))
+        print("Removed %d entries, %s" % (len(removed), format_size(sum(e[2] for e in removed))))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sequencer_media.py", description="Sequencer media tools")
+    commands = parser.add_subparsers(dest="command")
+    cache = commands.add_parser("cache", help="inspect or prune the shared proxy cache")
+    cache.add_argument("action", choices=("list", "prune"))
+    cache.add_argument("--root", help="cache directory, default %s" % cache_root())
+    cache.add_argument("--max-size", help="prune least recently used entries down to this size, like 500G")
+
+    args = parser.parse_args(argv)
+    if args.command == "cache":
+        if args.action == "prune" and args.max_size is None:
+            parser.error("cache prune needs --max-size")
+        try:
+            args.max_bytes = parse_size(args.max_size) if args.max_size is not None else None
+        except ValueError:
+            parser.error("invalid --max-size %r, use a size like 500G, 20M or 1024" % args.max_size)
+        return _cache_command(args)
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
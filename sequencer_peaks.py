@@ -0,0 +1,338 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Waveform peak pyramids for sound strips, independent of bpy.
+
+A pyramid holds for every bucket of samples its minimum, maximum and RMS
+over all channels. Level 0 buckets hold BASE samples per channel, every
+next level FACTOR times as many, so any zoom reads about one bucket per
+pixel from the level just below its samples per pixel.
+
+Peaks are built in one pass over the decoded sound, in chunks, and cached
+in a .peaks file named after the sampled content hash of the sound file
+(see sequencer_media.sample_hash). The file layout, all little-endian:
+
+    offset  size  field
+    0       8     magic b"VSEPEAK1"
+    8       4     uint32 format version, 1
+    12      4     uint32 sample rate
+    16      4     uint32 channel count
+    20      4     uint32 samples per bucket of level 0
+    24      4     uint32 factor between levels
+    28      4     uint32 level count L
+    32      8     uint64 sample frames of the sound
+    40      32    ASCII hex content hash of the sound file
+    72      16*L  per level: uint64 byte offset of its data, uint64 bucket count
+    ...           per level: bucket count rows of float32 (min, max, rms)
+
+The last bucket of each level may cover fewer samples. Files are memory
+mapped when read, so opening the peaks of a long recording costs nothing
+until a level is drawn.
+
+Run as a script to build peaks or to benchmark the builder:
+
+    python sequencer_peaks.py build sound.wav
+    python sequencer_peaks.py benchmark --hours 10
+"""
+
+import argparse
+import os
+import struct
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import sequencer_media
+
+
+MAGIC = b"VSEPEAK1"
+VERSION = 1
+BASE = 256
+FACTOR = 4
+LEVELS = 6
+
+_header = struct.Struct("<8sIIIIIIQ32s")
+_level_entry = struct.Struct("<QQ")
+
+
+def peaks_dir():
+    """Directory of the peak cache, next to the proxy cache"""
+    return os.path.join(os.path.dirname(sequencer_media.cache_root()), "blender_vse_peaks")
+
+
+def peaks_path(key):
+    return os.path.join(peaks_dir(), key[:2], key + ".peaks")
+
+
+class PeakBuilder:
+    """
+    Build a peak pyramid from blocks of samples fed in order.
+
+    add() takes arrays of shape (frames, channels) or (frames,) and keeps
+    only the samples of an unfinished bucket between calls, so memory use
+    is bounded by the block size and the level 0 peaks.
+    """
+
+    def __init__(self, sample_rate, channels, base=BASE, factor=FACTOR, levels=LEVELS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.base = base
+        self.factor = factor
+        self.levels = levels
+        self.frames = 0
+        self._carry = np.empty((0, channels), dtype=np.float32)
+        self._chunks = []
+
+    def _buckets(self, samples):
+        buckets = samples.reshape(-1, self.base * self.channels)
+        peaks = np.empty((len(buckets), 3), dtype=np.float32)
+        buckets.min(axis=1, out=peaks[:, 0])
+        buckets.max(axis=1, out=peaks[:, 1])
+        peaks[:, 2] = np.sqrt(np.einsum("ij,ij->i", buckets, buckets) / buckets.shape[1])
+        return peaks
+
+    def add(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1, self.channels)
+        self.frames += len(samples)
+        if len(self._carry):
+            samples = np.concatenate((self._carry, samples))
+        whole = len(samples) - len(samples) % self.base
+        if whole:
+            self._chunks.append(self._buckets(samples[:whole]))
+        self._carry = samples[whole:].copy()
+
+    def finish(self):
+        """The levels of the pyramid, arrays of shape (buckets, 3)"""
+        if len(self._carry):
+            tail = self._carry.reshape(1, -1)
+            peaks = np.array([[
+                tail.min(), tail.max(), np.sqrt(np.mean(np.square(tail))),
+            ]], dtype=np.float32)
+            self._chunks.append(peaks)
+            self._carry = self._carry[:0]
+        level = np.concatenate(self._chunks) if self._chunks else np.zeros((0, 3), dtype=np.float32)
+        self._chunks = [level]
+
+        levels = [level]
+        for _ in range(1, self.levels):
+            levels.append(reduce_level(levels[-1], self.factor))
+        return levels
+
+
+def reduce_level(level, factor):
+    """Combine every factor buckets of a level into one bucket of the next level"""
+    count = -(-len(level) // factor)
+    padded = len(level) % factor
+    if padded:
+        # Pad the last group by repeating its last bucket.
+        level = np.concatenate((level, np.repeat(level[-1:], factor - padded, axis=0)))
+    groups = level.reshape(count, factor, 3)
+    reduced = np.empty((count, 3), dtype=np.float32)
+    groups[:, :, 0].min(axis=1, out=reduced[:, 0])
+    groups[:, :, 1].max(axis=1, out=reduced[:, 1])
+    reduced[:, 2] = np.sqrt(np.mean(np.square(groups[:, :, 2]), axis=1))
+    return reduced
+
+
+def write_peaks(path, key, builder, levels):
+    """Write levels built by builder to path in the format described above"""
+    offset = _header.size + _level_entry.size * len(levels)
+    entries = []
+    for level in levels:
+        entries.append(_level_entry.pack(offset, len(level)))
+        offset += level.nbytes
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_header.pack(
+            MAGIC, VERSION, builder.sample_rate, builder.channels,
+            builder.base, builder.factor, len(levels), builder.frames, key.encode("ascii")))
+        for entry in entries:
+            f.write(entry)
+        for level in levels:
+            f.write(level.astype("<f4", copy=False).tobytes())
+    os.replace(tmp_path, path)
+
+
+class PeakFile:
+    """A .peaks file, its levels memory mapped"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(_header.size)
+            if len(header) < _header.size:
+                raise ValueError("Truncated peaks file: " + path)
+            (magic, version, self.sample_rate, self.channels, self.base,
+             self.factor, level_count, self.frames, key) = _header.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a version %d peaks file: %s" % (VERSION, path))
+            entries = [_level_entry.unpack(f.read(_level_entry.size)) for _ in range(level_count)]
+        self.key = key.decode("ascii")
+        self.path = path
+        self._levels = [
+            np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=(count, 3)) if count else
+            np.zeros((0, 3), dtype=np.float32)
+            for offset, count in entries
+        ]
+
+    def __len__(self):
+        return len(self._levels)
+
+    def level(self, index):
+        """Buckets of level index, rows of (min, max, rms)"""
+        return self._levels[index]
+
+    def samples_per_bucket(self, index):
+        return self.base * self.factor ** index
+
+    def level_for(self, samples_per_pixel):
+        """The coarsest level with at most samples_per_pixel samples per bucket"""
+        index = 0
+        while index + 1 < len(self._levels) and self.samples_per_bucket(index + 1) <= samples_per_pixel:
+            index += 1
+        return index
+
+
+def decode_chunks(path, sample_rate, channels, chunk_frames=1 << 20, ffmpeg="ffmpeg"):
+    """Decode a sound file with ffmpeg, yielding float32 arrays of up to chunk_frames frames"""
+    process = subprocess.Popen(
+        [ffmpeg, "-v", "error", "-i", path, "-vn", "-f", "f32le", "-acodec", "pcm_f32le",
+         "-ac", str(channels), "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    frame_bytes = 4 * channels
+    try:
+        while True:
+            data = process.stdout.read(chunk_frames * frame_bytes)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % frame_bytes]
+            yield np.frombuffer(data, dtype="<f4").reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode:
+        raise OSError("ffmpeg could not decode " + path)
+
+
+def build_peaks(path, chunks=None, sample_rate=None, channels=None):
+    """
+    Build and cache the peaks of the sound file at path, returns the
+    PeakFile. chunks can provide the decoded samples, like blocks of
+    aud.Sound.data(), otherwise ffmpeg decodes the file.
+    """
+    key = sequencer_media.sample_hash(path)
+    if chunks is None:
+        if sample_rate is None or channels is None:
+            info = sequencer_media.probe_media(path)
+            sample_rate = sample_rate or info["sample_rate"] or 48000
+            channels = channels or info["audio_channels"] or 2
+        chunks = decode_chunks(path, sample_rate, channels)
+
+    builder = PeakBuilder(sample_rate, channels)
+    for chunk in chunks:
+        builder.add(chunk)
+    out_path = peaks_path(key)
+    write_peaks(out_path, key, builder, builder.finish())
+    return PeakFile(out_path)
+
+
+def cached_peaks(path):
+    """The cached PeakFile of the sound file at path, None when there is none"""
+    try:
+        return PeakFile(peaks_path(sequencer_media.sample_hash(path)))
+    except (OSError, ValueError):
+        return None
+
+
+def _benchmark(args):
+    rate, channels = args.sample_rate, args.channels
+    total = int(args.hours * 3600 * rate)
+    chunk_frames = int(args.chunk_seconds * rate)
+    rng = np.random.default_rng(0) if hasattr(np.random, "default_rng") else np.random
+    # One chunk of noise over a slow sine, reused so generating samples
+    # doesn't count against the builder.
+    t = np.arange(chunk_frames, dtype=np.float32) / rate
+    chunk = (0.5 * np.sin(2 * np.pi * 0.1 * t)[:, None]
+             + 0.1 * rng.standard_normal((chunk_frames, channels))).astype(np.float32)
+
+    builder = PeakBuilder(rate, channels)
+    start = time.perf_counter()
+    done = 0
+    while done < total:
+        frames = min(chunk_frames, total - done)
+        builder.add(chunk[:frames])
+        done += frames
+    levels = builder.finish()
+    seconds = time.perf_counter() - start
+
+    print("%.1f hours of %d Hz %d channel audio: %d sample frames" % (args.hours, rate, channels, total))
+    print("built peaks in %.2fs, %.0fx real time, %.1f M samples/s" % (
+        seconds, args.hours * 3600 / seconds, total * channels / seconds / 1e6))
+    for index, level in enumerate(levels):
+        print("  level %d: %d samples per bucket, %d buckets" % (index, BASE * FACTOR ** index, len(level)))
+
+    if args.output:
+        start = time.perf_counter()
+        write_peaks(args.output, "0" * 32, builder, levels)
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        peaks = PeakFile(args.output)
+        level = peaks.level(peaks.level_for(total / 1920))
+        level[:, 1].max()
+        print("wrote %s (%s) in %.2fs, opened and read a full view level in %.4fs" % (
+            args.output, sequencer_media.format_size(os.path.getsize(args.output)),
+            written, time.perf_counter() - start))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sequencer_peaks.py", description="Waveform peak cache")
+    commands = parser.add_subparsers(dest="command")
+
+    build = commands.add_parser("build", help="build and cache the peaks of sound files")
+    build.add_argument("files", nargs="+")
+
+    benchmark = commands.add_parser("benchmark", help="time building peaks of generated audio")
+    benchmark.add_argument("--hours", type=float, default=10.0)
+    benchmark.add_argument("--sample-rate", type=int, default=48000)
+    benchmark.add_argument("--channels", type=int, default=2)
+    benchmark.add_argument("--chunk-seconds", type=float, default=60.0)
+    benchmark.add_argument("--output", help="also write the peaks to this file and read them back")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        for path in args.files:
+            start = time.perf_counter()
+            peaks = build_peaks(os.path.abspath(path))
+            print("%s -> %s (%.2fs)" % (path, peaks.path, time.perf_counter() - start))
+        return 0
+    if args.command == "benchmark":
+        return _benchmark(args)
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Timeline model for the sequencer edit algorithms, independent of bpy.
+
+A Timeline is a snapshot of the strips of one sequences collection in plain
+Python records. The edit functions below work on the records only, and
+Timeline.apply() writes back just the strips that changed, in an order
+which never makes two strips overlap on the way. Everything here runs
+without Blender, on any objects with the attributes of a bpy Sequence.
+"""
+
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+
+class Strip:
+    """
+    One strip of a Timeline.
+
+    start and end are the final frames shown in the timeline, frame_start
+    the frame the strip content starts at. inputs holds the names of the
+    strips an effect reads from.
+    """
+    __slots__ = ("name", "type", "channel", "frame_start", "start", "end", "lock", "mute", "select", "inputs")
+
+    def __init__(self, name, type, channel, frame_start, start, end,
+                 lock=False, mute=False, select=False, inputs=()):
+        self.name = name
+        self.type = type
+        self.channel = channel
+        self.frame_start = frame_start
+        self.start = start
+        self.end = end
+        self.lock = lock
+        self.mute = mute
+        self.select = select
+        self.inputs = tuple(inputs)
+
+    def __repr__(self):
+        return "<Strip %r channel %d, %d-%d>" % (self.name, self.channel, self.start, self.end)
+
+    @classmethod
+    def from_sequence(cls, s):
+        count = getattr(s, "input_count", 0)
+        inputs = ()
+        if count:
+            inputs = (s.input_1,) if count == 1 else (s.input_1, s.input_2)
+            inputs = tuple(i.name for i in inputs if i is not None)
+        return cls(
+            s.name, s.type, s.channel, s.frame_start, s.frame_final_start, s.frame_final_end,
+            s.lock, s.mute, s.select, inputs,
+        )
+
+
+class Timeline:
+    """
+    Strips of one sequences collection, with a channel index and the
+    effect dependencies built on demand
+    """
+    __slots__ = ("strips", "_sources", "_original", "_channels", "_readers")
+
+    def __init__(self, strips, sources=None):
+        self.strips = {s.name: s for s in strips}
+        self._sources = sources or {}
+        self._original = {s.name: (s.channel, s.frame_start, s.end - s.frame_start) for s in strips}
+        self._channels = None
+        self._readers = None
+
+    @classmethod
+    def from_sequences(cls, sequences):
+        """Snapshot a sequences collection, keeping the strips to write back to"""
+        sources = {}
+        strips = []
+        for s in sequences:
+            strips.append(Strip.from_sequence(s))
+            sources[s.name] = s
+        return cls(strips, sources)
+
+    def channels(self):
+        """Dict of channel -> (starts, ends, strips), sorted by start frame"""
+        if self._channels is None:
+            channels = {}
+            for s in self.strips.values():
+                channels.setdefault(s.channel, []).append(s)
+            self._channels = {}
+            for number, strips in channels.items():
+                strips.sort(key=attrgetter("start"))
+                self._channels[number] = ([s.start for s in strips], [s.end for s in strips], strips)
+        return self._channels
+
+    def channel(self, channel):
+        """(starts, ends, strips) of channel, sorted by start frame"""
+        return self.channels().get(channel, ([], [], []))
+
+    def next_strip(self, channel, frame):
+        """First strip on channel starting at or after frame, None if there is none"""
+        starts, _ends, strips = self.channel(channel)
+        i = bisect_left(starts, frame)
+        return strips[i] if i < len(strips) else None
+
+    def readers(self):
+        """Dict of strip name -> names of the effects reading from it"""
+        if self._readers is None:
+            self._readers = {}
+            for s in self.strips.values():
+                for name in s.inputs:
+                    self._readers.setdefault(name, []).append(s.name)
+        return self._readers
+
+    def dependents_of(self, names):
+        """Names of the effects reading from the named strips, directly or through other effects"""
+        readers = self.readers()
+        found = set()
+        pending = list(names)
+        while pending:
+            for reader in readers.get(pending.pop(), ()):
+                if reader not in found:
+                    found.add(reader)
+                    pending.append(reader)
+        return found
+
+    def remove(self, names):
+        """Forget the named strips, once they were deleted from the sequences"""
+        for name in names:
+            del self.strips[name]
+            self._sources.pop(name, None)
+            del self._original[name]
+        self._channels = None
+        self._readers = None
+
+    def translate(self, strip, frames):
+        strip.frame_start += frames
+        strip.start += frames
+        strip.end += frames
+        self._channels = None
+
+    def set_end(self, strip, frame):
+        strip.end = frame
+        self._channels = None
+
+    def set_channel(self, strip, channel):
+        strip.channel = channel
+        self._channels = None
+
+    def changes(self):
+        """(strip, channel changed, frames moved, end changed) of every changed strip"""
+        found = []
+        for name, (channel, frame_start, length) in self._original.items():
+            s = self.strips[name]
+            moved = s.frame_start - frame_start
+            resized = s.end - s.frame_start != length
+            if s.channel != channel or moved or resized:
+                found.append((s, s.channel != channel, moved, resized))
+        return found
+
+    def apply(self):
+        """
+        Write the changed strips back to the sequences they were read from.
+
+        Channel changes are written first, top down for strips moving up and
+        bottom up for strips moving down, then frame moves, front first, then
+        new end frames. Returns the number of strips written.
+        """
+        changes = self.changes()
+        original = self._original
+
+        def channel_order(change):
+            s = change[0]
+            up = s.channel > original[s.name][0]
+            return (not up, -s.channel if up else s.channel)
+
+        def move_order(change):
+            s, _channel, moved, _resized = change
+            # Left moves first, from the left; then right moves from the right.
+            return (moved > 0, -s.start if moved > 0 else s.start)
+
+        for s, channel, _moved, _resized in sorted((c for c in changes if c[1]), key=channel_order):
+            self._sources[s.name].channel = s.channel
+        for s, _channel, moved, _resized in sorted((c for c in changes if c[2]), key=move_order):
+            self._sources[s.name].frame_start = s.frame_start
+        for s, _channel, _moved, resized in changes:
+            if resized:
+                self._sources[s.name].frame_final_end = s.end
+
+        for s, _channel, _moved, _resized in changes:
+            original[s.name] = (s.channel, s.frame_start, s.end - s.frame_start)
+        return len(changes)
+
+
+def merge_ranges(ranges):
+    """Sort (start, end) frame ranges and merge the ones touching or overlapping"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def ripple_shift(timeline, removed):
+    """
+    Move strips left to close the emptied frame ranges in ``removed``,
+    a dict of channel -> [(start, end), ...].
+
+    Each channel is handled in one sorted sweep: every strip is moved by the
+    total length of the ranges before it. A locked strip is never moved and
+    ranges before it no longer pull the strips after it. The same goes for
+    effect strips, their inputs are on other channels and they only follow
+    those, so the strips after them would slide onto them.
+    """
+    index = timeline.channels()
+    for channel, channel_ranges in removed.items():
+        ranges = merge_ranges(channel_ranges)
+        strips = index.get(channel, ((), (), ()))[2]
+        range_index = 0
+        shift = 0
+
+        for s in strips:
+            while range_index < len(ranges) and ranges[range_index][1] <= s.start:
+                shift += ranges[range_index][1] - ranges[range_index][0]
+                range_index += 1
+            if s.lock or s.inputs:
+                shift = 0
+            elif shift:
+                timeline.translate(s, -shift)
+
+
+def close_gaps(timeline, names):
+    """
+    Close the gap after each named strip by moving the strips behind it on
+    its channel. The gaps are measured before anything moves, up to the
+    next strip which isn't an effect. A gap holding an effect strip is left
+    open, as the effect doesn't move with the strips of its channel.
+    Returns the names of the strips whose next strip was moved.
+    """
+    removed = {}
+    gaps = []
+    for name in names:
+        strip = timeline.strips[name]
+        starts, _ends, strips = timeline.channel(strip.channel)
+        following = strips[bisect_left(starts, strip.end):]
+        next_strip = next((s for s in following if not s.inputs), None)
+        if next_strip is None or next_strip.start == strip.end:
+            continue
+        if any(s.inputs and s.start < next_strip.start for s in following):
+            continue
+        removed.setdefault(strip.channel, []).append((strip.end, next_strip.start))
+        gaps.append((name, next_strip, next_strip.start))
+
+    ripple_shift(timeline, removed)
+    return [name for name, next_strip, start in gaps if next_strip.start != start]
+
+
+def extend_to_fill(timeline, names, frame_end):
+    """
+    Extend the end of each named strip up to the next strip on its channel,
+    or up to frame_end when no strip follows. Locked strips and effects are
+    left alone. Returns the names extended and the names without space.
+    """
+    targets = []
+    failed = []
+    for name in names:
+        strip = timeline.strips[name]
+        if strip.lock or strip.inputs:
+            continue
+        next_strip = timeline.next_strip(strip.channel, strip.end)
+        if next_strip is not None:
+            new_end = next_strip.start
+        else:
+            new_end = max(frame_end, strip.end)
+        if new_end == strip.end:
+            failed.append(name)
+        else:
+            targets.append((strip, new_end))
+
+    for strip, new_end in targets:
+        timeline.set_end(strip, new_end)
+    return [strip.name for strip, _new_end in targets], failed
+
+
+def _blocked(timeline, channel, start, end, moving):
+    # True when a strip not in moving overlaps start..end on channel.
+    starts, ends, strips = timeline.channel(channel)
+    i = bisect_left(starts, end)
+    while i > 0:
+        i -= 1
+        if ends[i] <= start:
+            break
+        if strips[i].name not in moving:
+            return True
+    return False
+
+
+def _free_space(timeline, strip, moving, forward):
+    # Frames between strip and the next strip not in moving on its channel,
+    # None when nothing blocks it.
+    starts, ends, strips = timeline.channel(strip.channel)
+    i = bisect_left(starts, strip.start)
+    if forward:
+        for j in range(i + 1, len(strips)):
+            if strips[j].name not in moving:
+                return starts[j] - strip.end
+    else:
+        for j in range(i - 1, -1, -1):
+            if strips[j].name not in moving:
+                return strip.start - ends[j]
+    return None
+
+
+def move_strips(timeline, names, frame_delta=0, channel_delta=0, channels=32):
+    """
+    Move the named strips together by frame_delta frames or channel_delta
+    channels.
+
+    A frame move is shortened to the free space in front of the strips, a
+    channel move skips channels until every strip fits. Effects follow
+    their inputs in time on their own; on a channel move the unlocked
+    effects whose inputs all move are carried along.
+    Returns the applied (frame_delta, channel_delta).
+    """
+    strips = [timeline.strips[name] for name in names]
+    moving = set(names)
+    dependents = timeline.dependents_of(names)
+
+    if channel_delta:
+        for name in dependents:
+            effect = timeline.strips[name]
+            if not effect.lock and all(i in moving for i in effect.inputs):
+                moving.add(name)
+                strips.append(effect)
+
+        step = 1 if channel_delta > 0 else -1
+        while True:
+            if any(not 1 <= s.channel + channel_delta <= channels for s in strips):
+                return (0, 0)
+            if not any(_blocked(timeline, s.channel + channel_delta, s.start, s.end, moving) for s in strips):
+                break
+            channel_delta += step
+
+        for s in strips:
+            timeline.set_channel(s, s.channel + channel_delta)
+        return (0, channel_delta)
+
+    if frame_delta:
+        moving |= dependents
+        forward = frame_delta > 0
+        distance = abs(frame_delta)
+        for s in strips:
+            space = _free_space(timeline, s, moving, forward)
+            if space is not None and space < distance:
+                distance = space
+
+        if distance <= 0:
+            return (0, 0)
+
+        frame_delta = distance if forward else -distance
+        for s in strips:
+            timeline.translate(s, frame_delta)
+        return (frame_delta, 0)
+
+    return (0, 0)
+
+
+def edit_point_distance(timeline, names, forward):
+    """
+    Frames from the first start or last end of the named strips to the
+    nearest start or end of the other strips in the move direction, 0 when
+    there is none.
+    """
+    moving = set(names)
+    moving |= timeline.dependents_of(names)
+
+    points = set()
+    for s in timeline.strips.values():
+        if s.name not in moving:
+            points.add(s.start)
+            points.add(s.end)
+    points = sorted(points)
+
+    strips = [timeline.strips[name] for name in names]
+    distances = []
+    for edge in (min(s.start for s in strips), max(s.end for s in strips)):
+        if forward:
+            i = bisect_right(points, edge)
+            if i < len(points):
+                distances.append(points[i] - edge)
+        else:
+            i = bisect_left(points, edge)
+            if i > 0:
+                distances.append(edge - points[i - 1])
+    return min(distances) if distances else 0
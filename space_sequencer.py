@@ -19,6 +19,7 @@
 # <pep8 compliant>
 import bpy
 from bpy.types import Header, Menu, Panel
+from functools import lru_cache
 from rna_prop_ui import PropertyPanel
 from .properties_grease_pencil_common import (
     AnnotationDataPanel,
@@ -27,13 +28,53 @@ from .properties_grease_pencil_common import (
 from bpy.app.translations import pgettext_iface as iface_
 
 
-def act_strip(context):
+# Values looked up by many panels, computed once per redraw. The cache is
+# emptied by a timer, which runs before the next events are handled. The
+# timer is persistent, so loading a file never leaves the cache filled.
+_draw_cache = {}
+
+
+def _clear_draw_cache():
+    _draw_cache.clear()
+    return None
+
+
+def draw_cached(key, compute):
+    try:
+        return _draw_cache[key]
+    except KeyError:
+        pass
+    if not bpy.app.timers.is_registered(_clear_draw_cache):
+        bpy.app.timers.register(_clear_draw_cache, first_interval=0.0, persistent=True)
+    value = _draw_cache[key] = compute()
+    return value
+
+
+def _active_strip(scene):
     try:
-        return context.scene.sequence_editor.active_strip
+        return scene.sequence_editor.active_strip
     except AttributeError:
         return None
 
 
+def act_strip(context):
+    scene = context.scene
+    if scene is None:
+        return None
+    return draw_cached(("act_strip", scene.as_pointer()), lambda: _active_strip(scene))
+
+
+@lru_cache(maxsize=1024)
+def timecode_from_frame(frame, fps, fps_base):
+    """SMPTE timecode of frame with the colons as spaces, memoized for redraws"""
+    return bpy.utils.smpte_from_frame(frame, fps=fps, fps_base=fps_base).replace(':', ' ')
+
+
+def timecodes_from_frames(frames, fps, fps_base):
+    """Timecodes of a sequence of frames, see timecode_from_frame"""
+    return [timecode_from_frame(frame, fps, fps_base) for frame in frames]
+
+
 def draw_color_balance(layout, color_balance):
 
     flow = layout.grid_flow(row_major=True, columns=0, even_columns=True, even_rows=False, align=False)
@@ -352,6 +393,15 @@ class SEQUENCER_MT_transform_move(Menu):
         layout.operator("sequencer.move", text = "Left").direction = "LEFT"
         layout.operator("sequencer.move", text = "Right").direction = "RIGHT"
 
+        layout.separator()
+
+        props = layout.operator("sequencer.move", text = "Left to Edit Point")
+        props.direction = "LEFT"
+        props.step_type = 'EDIT_POINT'
+        props = layout.operator("sequencer.move", text = "Right to Edit Point")
+        props.direction = "RIGHT"
+        props.step_type = 'EDIT_POINT'
+
 
 class SEQUENCER_MT_transform(Menu):
     bl_label = "Transform"
@@ -435,6 +485,7 @@ class SEQUENCER_MT_select_channel(Menu):
         layout = self.layout
 
         layout.operator("sequencer.select_channel_strips", text="All")
+        layout.operator("sequencer.select_channel_strips", text="All Extend").extend = True
         layout.operator("sequencer.select_active_side", text="Left").side = 'LEFT'
         layout.operator("sequencer.select_active_side", text="Right").side = 'RIGHT'
 
@@ -509,6 +560,7 @@ class SEQUENCER_MT_select(Menu):
         layout.separator()
 
         layout.operator_menu_enum("sequencer.select_grouped", "type", text="Grouped")
+        layout.operator("sequencer.select_query", text="Query...")
 
 
 class SEQUENCER_MT_marker(Menu):
@@ -851,6 +903,7 @@ class SEQUENCER_MT_strip_movie(Menu):
         layout.operator("sequencer.reverse_selected_movies", text="Reverse")
         layout.operator("sequencer.flip_x_selected_movies", text="Flip X")
         layout.operator("sequencer.flip_y_selected_movies", text="Flip Y")
+        layout.operator("sequencer.bulk_set", text="Set Properties...")
 
         layout.separator()
 
@@ -972,7 +1025,11 @@ class SequencerButtonsPanel:
 
     @staticmethod
     def has_sequencer(context):
-        return (context.space_data.view_type in {'SEQUENCER', 'SEQUENCER_PREVIEW'})
+        st = context.space_data
+        return draw_cached(
+            ("has_sequencer", st.as_pointer()),
+            lambda: st.view_type in {'SEQUENCER', 'SEQUENCER_PREVIEW'},
+        )
 
     @classmethod
     def poll(cls, context):
@@ -1083,11 +1140,30 @@ class SEQUENCER_PT_edit(SequencerButtonsPanel, Panel):
                     row.prop(strip, "show_waveform")
                 row.prop(sound, "use_mono")
 
+                from bl_operators.sequencer import PEAKS_PROP, media_path, peak_error, peak_file
+
+                if strip.get(PEAKS_PROP):
+                    path = media_path(strip)
+                    error = peak_error(path) if path is not None else None
+                    if error is not None:
+                        layout.label(text="Waveform Peaks: " + error, icon='ERROR')
+                    else:
+                        ready = path is not None and peak_file(path) is not None
+                        layout.label(text="Waveform Peaks: " + ("Cached" if ready else "Building..."))
+
 
 class SEQUENCER_PT_effect(SequencerButtonsPanel, Panel):
     bl_label = "Effect Strip"
     bl_category = "Strip"
 
+    effect_types = frozenset({
+        'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
+        'CROSS', 'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP',
+        'WIPE', 'GLOW', 'TRANSFORM', 'COLOR', 'SPEED',
+        'MULTICAM', 'GAUSSIAN_BLUR', 'TEXT', 'COLORMIX',
+    })
+    fader_types = frozenset({'CROSS', 'GAMMA_CROSS', 'WIPE', 'ALPHA_OVER', 'ALPHA_UNDER', 'OVER_DROP'})
+
     @classmethod
     def poll(cls, context):
         if not cls.has_sequencer(context):
@@ -1097,12 +1173,7 @@ class SEQUENCER_PT_effect(SequencerButtonsPanel, Panel):
         if not strip:
             return False
 
-        return strip.type in {
-            'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
-            'CROSS', 'GAMMA_CROSS', 'MULTIPLY', 'OVER_DROP',
-            'WIPE', 'GLOW', 'TRANSFORM', 'COLOR', 'SPEED',
-            'MULTICAM', 'GAUSSIAN_BLUR', 'TEXT', 'COLORMIX'
-        }
+        return strip.type in cls.effect_types
 
     def draw(self, context):
         layout = self.layout
@@ -1208,6 +1279,10 @@ class SEQUENCER_PT_effect(SequencerButtonsPanel, Panel):
                 if strip.channel > BT_ROW and (strip_channel - 1) % BT_ROW:
                     for i in range(strip.channel, strip_channel + ((BT_ROW + 1 - strip_channel) % BT_ROW)):
                         row.label(text="")
+
+                col = layout.column(align=True)
+                col.operator("sequencer.cut_multicam_list", text="Cut from Markers").source = 'MARKERS'
+                col.operator("sequencer.cut_multicam_list", text="Cut from File...").source = 'FILE'
             else:
                 col.separator()
                 col.label(text="Two or more channels are needed below this strip", icon='INFO')
@@ -1239,7 +1314,7 @@ class SEQUENCER_PT_effect(SequencerButtonsPanel, Panel):
         col = layout.column(align=True)
         if strip.type == 'SPEED':
             col.prop(strip, "multiply_speed")
-        elif strip.type in {'CROSS', 'GAMMA_CROSS', 'WIPE', 'ALPHA_OVER', 'ALPHA_UNDER', 'OVER_DROP'}:
+        elif strip.type in self.fader_types:
             col.prop(strip, "use_default_fade", text="Default fade")
             if not strip.use_default_fade:
                 col.prop(strip, "effect_fader", text="Effect Fader")
@@ -1257,6 +1332,8 @@ class SEQUENCER_PT_input(SequencerButtonsPanel, Panel):
     bl_label = "Strip Input"
     bl_category = "Strip"
 
+    input_types = frozenset({'MOVIE', 'IMAGE'})
+
     @classmethod
     def poll(cls, context):
         if not cls.has_sequencer(context):
@@ -1266,7 +1343,7 @@ class SEQUENCER_PT_input(SequencerButtonsPanel, Panel):
         if not strip:
             return False
 
-        return strip.type in {'MOVIE', 'IMAGE'}
+        return strip.type in cls.input_types
 
         ''', 'SCENE', 'MOVIECLIP', 'META',
         'ADD', 'SUBTRACT', 'ALPHA_OVER', 'ALPHA_UNDER',
@@ -1469,9 +1546,24 @@ class SEQUENCER_PT_data(SequencerButtonsPanel, Panel):
         scene = context.scene
         frame_current = scene.frame_current
         strip = act_strip(context)
+        fps = scene.render.fps
+        fps_base = scene.render.fps_base
 
-        length_list = [str(strip.frame_start), str(strip.frame_final_end), str(strip.frame_final_duration), str(strip.frame_offset_start), str(strip.frame_offset_end), str(strip.animation_offset_start), str(strip.animation_offset_end)]
-        max_length = max(len(x) for x in length_list)
+        playhead = frame_current - strip.frame_start
+        frames = (
+            strip.frame_start, strip.frame_final_end, strip.frame_final_duration,
+            strip.frame_offset_start, strip.frame_offset_end,
+            strip.animation_offset_start, strip.animation_offset_end,
+            playhead,
+        )
+        (
+            start_tc, end_tc, duration_tc,
+            offset_start_tc, offset_end_tc,
+            animation_start_tc, animation_end_tc,
+            playhead_tc,
+        ) = timecodes_from_frames(frames, fps, fps_base)
+
+        max_length = max(len(str(frame)) for frame in frames[:-1])
         max_factor = (1.9-max_length)/30
 
         sub = layout.row(align=True)
@@ -1486,15 +1578,15 @@ class SEQUENCER_PT_data(SequencerButtonsPanel, Panel):
         split = sub.split(factor=0.5+max_factor)
         split.alignment = 'RIGHT'
         split.label(text="Start")
-        split.prop(strip, "frame_start", text=str(bpy.utils.smpte_from_frame(strip.frame_start)).replace(':', ' '))
+        split.prop(strip, "frame_start", text=start_tc)
         split = sub.split(factor=0.5+max_factor)
         split.alignment = 'RIGHT'
         split.label(text="End")
-        split.prop(strip, "frame_final_end", text=str(bpy.utils.smpte_from_frame(strip.frame_final_end)).replace(':', ' '))
+        split.prop(strip, "frame_final_end", text=end_tc)
         split = sub.split(factor=0.5+max_factor)
         split.alignment = 'RIGHT'
         split.label(text="Duration")
-        split.prop(strip, "frame_final_duration", text=str(bpy.utils.smpte_from_frame(strip.frame_final_duration)).replace(':', ' '))
+        split.prop(strip, "frame_final_duration", text=duration_tc)
 
         if not isinstance(strip, bpy.types.EffectSequence):
             layout.alignment = 'RIGHT'
@@ -1502,31 +1594,30 @@ class SEQUENCER_PT_data(SequencerButtonsPanel, Panel):
             split = sub.split(factor=0.5+max_factor, align=True)
             split.alignment = 'RIGHT'
             split.label(text="Soft Trim Start")
-            split.prop(strip, "frame_offset_start", text=str(bpy.utils.smpte_from_frame(strip.frame_offset_start)).replace(':', ' '))
+            split.prop(strip, "frame_offset_start", text=offset_start_tc)
             split = sub.split(factor=0.5+max_factor, align=True)
             split.alignment = 'RIGHT'
             split.label(text='End')
-            split.prop(strip, "frame_offset_end", text=str(bpy.utils.smpte_from_frame(strip.frame_offset_end)).replace(':', ' '))
+            split.prop(strip, "frame_offset_end", text=offset_end_tc)
 
             layout.alignment = 'RIGHT'
             sub = layout.column(align=True)
             split = sub.split(factor=0.5+max_factor)
             split.alignment = 'RIGHT'
             split.label(text="Hard Trim Start")
-            split.prop(strip, "animation_offset_start", text=str(bpy.utils.smpte_from_frame(strip.animation_offset_start)).replace(':', ' '))
+            split.prop(strip, "animation_offset_start", text=animation_start_tc)
             split = sub.split(factor=0.5+max_factor, align=True)
             split.alignment = 'RIGHT'
             split.label(text='End')
-            split.prop(strip, "animation_offset_end", text=str(bpy.utils.smpte_from_frame(strip.animation_offset_end)).replace(':', ' '))
+            split.prop(strip, "animation_offset_end", text=animation_end_tc)
 
-        playhead = frame_current - strip.frame_start
         col = layout.column(align=True)
         col = col.box()
         col.active = (frame_current >= strip.frame_start and frame_current <= strip.frame_start + strip.frame_final_duration)
         split = col.split(factor=0.5+max_factor)
         split.alignment = 'RIGHT'
         split.label(text="Playhead")
-        split.label(text="%s:   %s" % ((bpy.utils.smpte_from_frame(playhead).replace(':', ' ')), (str(playhead))))
+        split.label(text="%s:   %s" % (playhead_tc, playhead))
 
         ''' Old data - anyone missing this data?
         col.label(text=iface_("Frame Offset %d:%d") % (strip.frame_offset_start, strip.frame_offset_end),
@@ -1547,7 +1638,40 @@ class SEQUENCER_PT_data(SequencerButtonsPanel, Panel):
             if elem and elem.orig_width > 0 and elem.orig_height > 0:
                 split.label(text="%dx%d" % (elem.orig_width, elem.orig_height), translate=False)
             else:
-                split.label(text="None")
+                # Not decoded yet, use the media index.
+                from bl_operators.sequencer import media_info
+
+                info = media_info(strip)
+                if info and info["width"] and info["height"]:
+                    split.label(text="%dx%d" % (info["width"], info["height"]), translate=False)
+                else:
+                    split.label(text="None")
+
+        if strip.type in {'MOVIE', 'SOUND'}:
+            from bl_operators.sequencer import media_info, media_probe_error
+
+            info = media_info(strip)
+            error = media_probe_error() if info is None else None
+            if error:
+                split = col.split(factor=0.5+max_factor)
+                split.alignment = 'RIGHT'
+                split.label(text="Media")
+                split.label(text=error, icon='ERROR')
+            elif info:
+                media = []
+                if info["codec"]:
+                    media.append(info["codec"])
+                if info["fps"]:
+                    media.append("%.2f fps" % info["fps"])
+                if info["gop"]:
+                    media.append("GOP %d" % info["gop"])
+                if info["audio_channels"]:
+                    media.append("%d ch %d Hz" % (info["audio_channels"], info["sample_rate"] or 0))
+                if media:
+                    split = col.split(factor=0.5+max_factor)
+                    split.alignment = 'RIGHT'
+                    split.label(text="Media")
+                    split.label(text=", ".join(media), translate=False)
 
         if strip.type == "SCENE":
             scene = strip.scene
@@ -1566,6 +1690,14 @@ class SEQUENCER_PT_filter(SequencerButtonsPanel, Panel):
     bl_label = "Filter"
     bl_category = "Strip"
 
+    filter_types = frozenset({
+        'MOVIE', 'IMAGE', 'SCENE', 'MOVIECLIP', 'MASK',
+        'META', 'ADD', 'SUBTRACT', 'ALPHA_OVER',
+        'ALPHA_UNDER', 'CROSS', 'GAMMA_CROSS', 'MULTIPLY',
+        'OVER_DROP', 'WIPE', 'GLOW', 'TRANSFORM', 'COLOR',
+        'MULTICAM', 'SPEED', 'ADJUSTMENT', 'COLORMIX',
+    })
+
     @classmethod
     def poll(cls, context):
         if not cls.has_sequencer(context):
@@ -1575,13 +1707,7 @@ class SEQUENCER_PT_filter(SequencerButtonsPanel, Panel):
         if not strip:
             return False
 
-        return strip.type in {
-            'MOVIE', 'IMAGE', 'SCENE', 'MOVIECLIP', 'MASK',
-            'META', 'ADD', 'SUBTRACT', 'ALPHA_OVER',
-            'ALPHA_UNDER', 'CROSS', 'GAMMA_CROSS', 'MULTIPLY',
-            'OVER_DROP', 'WIPE', 'GLOW', 'TRANSFORM', 'COLOR',
-            'MULTICAM', 'SPEED', 'ADJUSTMENT', 'COLORMIX'
-        }
+        return strip.type in cls.filter_types
 
     def draw(self, context):
         layout = self.layout
@@ -1621,6 +1747,8 @@ class SEQUENCER_PT_proxy(SequencerButtonsPanel, Panel):
     bl_label = "Proxy/Timecode"
     bl_category = "Strip"
 
+    proxy_types = frozenset({'MOVIE', 'IMAGE', 'SCENE', 'META', 'MULTICAM'})
+
     @classmethod
     def poll(cls, context):
         if not cls.has_sequencer(context):
@@ -1630,7 +1758,7 @@ class SEQUENCER_PT_proxy(SequencerButtonsPanel, Panel):
         if not strip:
             return False
 
-        return strip.type in {'MOVIE', 'IMAGE', 'SCENE', 'META', 'MULTICAM'}
+        return strip.type in cls.proxy_types
 
     def draw_header(self, context):
         strip = act_strip(context)
@@ -1687,6 +1815,30 @@ class SEQUENCER_PT_proxy(SequencerButtonsPanel, Panel):
         col = layout.column()
         col.operator("sequencer.enable_proxies")
         col.operator("sequencer.rebuild_proxy")
+        col.operator("sequencer.proxy_build_parallel")
+        col.operator("sequencer.proxy_use_shared_cache")
+
+        from bl_operators.sequencer import ProxyBuildState, stale_proxy_count
+
+        stale = stale_proxy_count(context)
+        row = col.row(align=True)
+        if stale is None:
+            row.operator("sequencer.rebuild_proxy_stale", text="Rebuild Stale Proxies (...)")
+        else:
+            row.operator("sequencer.rebuild_proxy_stale", text="Rebuild Stale Proxies (%d)" % stale)
+            row.enabled = stale > 0
+
+        queue = ProxyBuildState.queue
+        if ProxyBuildState.running and queue:
+            done = sum(1 for entry in queue if entry["status"] == 'DONE')
+            box = layout.box()
+            col = box.column(align=True)
+            col.label(text="Building proxies: %d of %d done" % (done, len(queue)), icon='TIME')
+            for entry in queue:
+                if entry["status"] == 'RUNNING':
+                    col.label(text=entry["strip"], icon='PLAY')
+                elif entry["status"] == 'FAILED':
+                    col.label(text=entry["strip"], icon='ERROR')
 
 
 class SEQUENCER_PT_preview(SequencerButtonsPanel_Output, Panel):
@@ -1710,6 +1862,49 @@ class SEQUENCER_PT_preview(SequencerButtonsPanel_Output, Panel):
         col.prop(render, "use_sequencer_gl_dof")
 
 
+class SEQUENCER_PT_profiling(SequencerButtonsPanel, Panel):
+    bl_label = "Operator Profiling"
+    bl_category = "Profiling"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        return cls.has_sequencer(context)
+
+    def draw(self, context):
+        from bl_operators.sequencer import OperatorProfiler
+
+        layout = self.layout
+
+        if OperatorProfiler.enabled:
+            layout.operator("sequencer.profiling_toggle", text="Stop Profiling", icon='PAUSE')
+        else:
+            layout.operator("sequencer.profiling_toggle", text="Start Profiling", icon='PLAY')
+
+        stats = OperatorProfiler.stats
+        if not stats:
+            layout.label(text="No operator runs recorded")
+            return
+
+        for idname, stat in sorted(stats.items(), key=lambda item: -item[1]["total_seconds"]):
+            last = stat["runs"][-1]
+            box = layout.box()
+            col = box.column(align=True)
+            col.label(text=idname)
+            col.label(text="%d calls, %.1f ms total, %.1f ms max" % (
+                stat["calls"], stat["total_seconds"] * 1000.0, stat["max_seconds"] * 1000.0))
+            col.label(text="Last: %d nested ops, %d strips changed, %d KB peak" % (
+                last["nested_calls"],
+                last.get("strips_added", 0) + last.get("strips_removed", 0) + last.get("strips_changed", 0),
+                last.get("peak_bytes", 0) // 1024))
+            for name, count in sorted(last["nested"].items(), key=lambda item: -item[1])[:3]:
+                col.label(text="    %s x%d" % (name, count))
+
+        row = layout.row(align=True)
+        row.operator("sequencer.profiling_clear", text="Clear")
+        row.operator("sequencer.profiling_dump", text="Save JSON...")
+
+
 class SEQUENCER_PT_view(SequencerButtonsPanel_Output, Panel):
     bl_label = "View Settings"
 
@@ -1909,6 +2104,7 @@ classes = (
     SEQUENCER_PT_filter,
     SEQUENCER_PT_data,
     SEQUENCER_PT_proxy,
+    SEQUENCER_PT_profiling,
     SEQUENCER_PT_preview,
     SEQUENCER_PT_view,
     SEQUENCER_PT_view_safe_areas,
@@ -0,0 +1,158 @@
+"""Tests of sequencer_media, run without Blender"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sequencer_media import ProxyCache, ProxyManifest, format_size, parse_size, sample_hash
+
+
+class MediaTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class SizeTest(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("1024"), 1024)
+        self.assertEqual(parse_size("20M"), 20 << 20)
+        self.assertEqual(parse_size("1.5gb"), 3 << 29)
+        with self.assertRaises(ValueError):
+            parse_size("bogus")
+
+    def test_format_size(self):
+        self.assertEqual(format_size(512), "512.0B")
+        self.assertEqual(format_size(3 << 30), "3.0G")
+
+
+class SampleHashTest(MediaTestCase):
+
+    def test_hash_follows_content(self):
+        path = self.write("a.bin", b"x" * 5000)
+        same = self.write("b.bin", b"x" * 5000)
+        other = self.write("c.bin", b"x" * 4999 + b"y")
+        self.assertEqual(sample_hash(path), sample_hash(same))
+        self.assertNotEqual(sample_hash(path), sample_hash(other))
+
+    def test_sampled_blocks_of_large_files(self):
+        data = bytearray(64 * 1024)
+        path = self.write("a.bin", bytes(data))
+        before = sample_hash(path, sample_size=1024, samples=4)
+        # A change between the samples goes unnoticed, a change inside one doesn't.
+        data[2000] = 1
+        self.write("a.bin", bytes(data))
+        self.assertEqual(sample_hash(path, sample_size=1024, samples=4), before)
+        data[0] = 1
+        self.write("a.bin", bytes(data))
+        self.assertNotEqual(sample_hash(path, sample_size=1024, samples=4), before)
+
+
+class ProxyManifestTest(MediaTestCase):
+
+    def test_staleness(self):
+        source = self.write("clip.mov", b"frames")
+        settings = {"sizes": [25], "quality": 90}
+        manifest = ProxyManifest(os.path.join(self.directory, "proxies"))
+        self.assertTrue(manifest.is_stale(source, settings))
+
+        manifest.record(source, settings)
+        manifest.save()
+        manifest = ProxyManifest(manifest.directory)
+        self.assertFalse(manifest.is_stale(source, settings))
+        self.assertTrue(manifest.is_stale(source, dict(settings, quality=50)))
+
+        # Touched but unchanged sources still have valid proxies, and the
+        # new mtime is saved so they aren't hashed again.
+        stat = os.stat(source)
+        os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+        self.assertFalse(manifest.changed)
+        self.assertFalse(manifest.is_stale(source, settings))
+        self.assertTrue(manifest.changed)
+        manifest.save()
+        manifest = ProxyManifest(manifest.directory)
+        self.assertEqual(manifest.entries[source]["mtime"], os.stat(source).st_mtime)
+        self.assertFalse(manifest.changed)
+
+        self.write("clip.mov", b"others")
+        os.utime(source, (stat.st_atime, stat.st_mtime + 20))
+        self.assertTrue(manifest.is_stale(source, settings))
+
+    def test_missing_proxy_files(self):
+        source = self.write("clip.mov", b"frames")
+        proxy = self.write("proxy_25.avi", b"proxy")
+        settings = {"sizes": [25], "quality": 90}
+        manifest = ProxyManifest(os.path.join(self.directory, "proxies"))
+        manifest.record(source, settings, [proxy])
+        self.assertFalse(manifest.is_stale(source, settings))
+        os.remove(proxy)
+        self.assertTrue(manifest.is_stale(source, settings))
+
+    def test_image_sequence(self):
+        frames = [self.write("frame_%04d.exr" % i, b"pixels") for i in range(1, 6)]
+        settings = {"sizes": [25], "quality": 90}
+        manifest = ProxyManifest(os.path.join(self.directory, "proxies"))
+        manifest.record(frames, settings)
+        self.assertFalse(manifest.is_stale(frames, settings))
+        # A shorter sequence with the same first frame has no proxies yet.
+        self.assertTrue(manifest.is_stale(frames[:3], settings))
+
+        # A frame in the middle re-rendered to the same size.
+        stat = os.stat(frames[2])
+        self.write("frame_0003.exr", b"PIXELS")
+        os.utime(frames[2], (stat.st_atime, stat.st_mtime + 10))
+        self.assertTrue(manifest.is_stale(frames, settings))
+
+
+class ProxyCacheTest(MediaTestCase):
+
+    def test_settings_share_entries_across_sizes(self):
+        source = self.write("clip.mov", b"frames")
+        self.assertEqual(
+            ProxyCache.key(source, {"sizes": [25], "quality": 90}),
+            ProxyCache.key(source, {"sizes": [50, 100], "quality": 90}))
+        self.assertNotEqual(
+            ProxyCache.key(source, {"quality": 90}),
+            ProxyCache.key(source, {"quality": 50}))
+
+    def test_image_sequences(self):
+        settings = {"quality": 90}
+        frames = [self.write("frame_%04d.png" % i, b"pixels") for i in range(1, 6)]
+        key = ProxyCache.key(frames, settings)
+        # Sequences sharing the first image have their own entries.
+        self.assertNotEqual(ProxyCache.key(frames[:3], settings), key)
+        stat = os.stat(frames[3])
+        self.write("frame_0004.png", b"PIXELS")
+        os.utime(frames[3], (stat.st_atime, stat.st_mtime + 10))
+        self.assertNotEqual(ProxyCache.key(frames, settings), key)
+
+    def test_prune_removes_least_recently_used(self):
+        cache = ProxyCache(os.path.join(self.directory, "cache"))
+        directories = []
+        for i, name in enumerate(("old.mov", "new.mov", "kept.mov")):
+            source = self.write(name, name.encode())
+            directory = cache.use(source, {"quality": 90})
+            with open(os.path.join(directory, "proxy_25.avi"), "wb") as f:
+                f.write(b"p" * 1000)
+            info_path = os.path.join(directory, ProxyCache.info_name)
+            os.utime(info_path, (1000 + i, 1000 + i))
+            directories.append(directory)
+
+        # The kept entry is the oldest one after this.
+        os.utime(os.path.join(directories[2], ProxyCache.info_name), (10, 10))
+        removed = cache.prune(2500, keep=[directories[2]])
+        self.assertEqual([entry[1] for entry in removed], [directories[0]])
+        self.assertEqual(sorted(entry[1] for entry in cache.entries()), sorted(directories[1:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Tests of sequencer_peaks, run without Blender"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    import sequencer_peaks
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "sequencer_peaks needs NumPy")
+class PeakBuilderTest(unittest.TestCase):
+
+    def build(self, samples, chunk, **kwargs):
+        builder = sequencer_peaks.PeakBuilder(48000, samples.shape[1], **kwargs)
+        for i in range(0, len(samples), chunk):
+            builder.add(samples[i:i + chunk])
+        return builder, builder.finish()
+
+    def test_chunking_does_not_change_peaks(self):
+        samples = np.sin(np.arange(10000, dtype=np.float32) / 50).reshape(-1, 2)
+        _builder, whole = self.build(samples, len(samples), base=16, factor=4, levels=3)
+        _builder, chunked = self.build(samples, 333, base=16, factor=4, levels=3)
+        for a, b in zip(whole, chunked):
+            np.testing.assert_allclose(a, b, rtol=1e-6)
+
+    def test_levels(self):
+        samples = np.arange(22, dtype=np.float32).reshape(11, 2) / 10
+        builder, levels = self.build(samples, 3, base=4, factor=2, levels=3)
+        self.assertEqual(builder.frames, 11)
+        self.assertEqual([len(level) for level in levels], [3, 2, 1])
+        # Buckets of 4 frames of 2 channels, the last one partial.
+        np.testing.assert_allclose(levels[0][:, 0], [0.0, 0.8, 1.6])
+        np.testing.assert_allclose(levels[0][:, 1], [0.7, 1.5, 2.1])
+        np.testing.assert_allclose(levels[2][0, :2], [0.0, 2.1])
+        rms = np.sqrt(np.mean(np.square(samples[:8])))
+        np.testing.assert_allclose(levels[1][0, 2], rms, rtol=1e-6)
+
+
+@unittest.skipIf(np is None, "sequencer_peaks needs NumPy")
+class PeakFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_write_and_read(self):
+        builder = sequencer_peaks.PeakBuilder(44100, 1)
+        builder.add(np.linspace(-1, 1, 300000, dtype=np.float32))
+        levels = builder.finish()
+        path = os.path.join(self.directory, "a.peaks")
+        sequencer_peaks.write_peaks(path, "ab" * 16, builder, levels)
+
+        peaks = sequencer_peaks.PeakFile(path)
+        self.assertEqual((peaks.sample_rate, peaks.channels, peaks.frames), (44100, 1, 300000))
+        self.assertEqual(peaks.key, "ab" * 16)
+        self.assertEqual(len(peaks), sequencer_peaks.LEVELS)
+        for index, level in enumerate(levels):
+            np.testing.assert_array_equal(peaks.level(index), level)
+
+        self.assertEqual(peaks.level_for(100), 0)
+        self.assertEqual(peaks.level_for(1024), 1)
+        self.assertEqual(peaks.level_for(5000), 2)
+        self.assertEqual(peaks.level_for(10 ** 9), sequencer_peaks.LEVELS - 1)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.directory, "b.peaks")
+        with open(path, "wb") as f:
+            f.write(b"RIFF" + bytes(100))
+        with self.assertRaises(ValueError):
+            sequencer_peaks.PeakFile(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""Tests of the strip query parser of sequencer.py, run inside Blender"""
+
+import unittest
+
+try:
+    from bl_operators import sequencer
+except ImportError:
+    sequencer = None
+
+
+@unittest.skipIf(sequencer is None, "sequencer.py needs Blender's Python")
+class CompileQueryTest(unittest.TestCase):
+
+    def test_valid_queries(self):
+        for expression in (
+                "channel > 2 and not lock",
+                "type in {movie, IMAGE} or name == 'intro'",
+                "start >= 100 and frame in [100, 500]",
+                "lock == 1",
+        ):
+            predicate, _plan = sequencer.compile_query(expression)
+            self.assertTrue(callable(predicate))
+
+    def test_mismatched_types(self):
+        for expression in (
+                "channel > abc",
+                "start < movie",
+                "type == 3",
+                "name != 2",
+                "channel in ['a', 'b']",
+                "frame == intro",
+                "end in {10, x}",
+        ):
+            with self.assertRaises(ValueError, msg=expression):
+                sequencer.compile_query(expression)
+
+
+if __name__ == "__main__":
+    unittest.main()
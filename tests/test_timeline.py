@@ -0,0 +1,278 @@
+"""Tests of sequencer_timeline, run without Blender"""
+
+import unittest
+
+from sequencer_timeline import (
+    Strip,
+    Timeline,
+    close_gaps,
+    edit_point_distance,
+    extend_to_fill,
+    move_strips,
+    ripple_shift,
+)
+
+
+def timeline(*strips):
+    return Timeline([Strip(name, 'COLOR', channel, start, start, end, lock=lock)
+                     for name, channel, start, end, lock in strips])
+
+
+def spans(tl):
+    return {name: (s.channel, s.start, s.end) for name, s in tl.strips.items()}
+
+
+class FakeSequence:
+    """Stand-in for a bpy Sequence which refuses to overlap another one"""
+
+    def __init__(self, timeline, name, channel, start, end):
+        self.timeline = timeline
+        self.name = name
+        self.type = 'COLOR'
+        self.lock = self.mute = self.select = False
+        self.input_count = 0
+        self._channel = channel
+        self._start = start
+        self._end = end
+        self.writes = timeline.setdefault("writes", [])
+        timeline.setdefault("sequences", []).append(self)
+
+    def _check(self, channel, start, end):
+        for other in self.timeline["sequences"]:
+            if other is not self and other._channel == channel and other._start < end and start < other._end:
+                raise AssertionError("%s overlaps %s" % (self.name, other.name))
+
+    @property
+    def channel(self):
+        return self._channel
+
+    @channel.setter
+    def channel(self, value):
+        self._check(value, self._start, self._end)
+        self._channel = value
+        self.writes.append((self.name, "channel"))
+
+    @property
+    def frame_start(self):
+        return self._start
+
+    @frame_start.setter
+    def frame_start(self, value):
+        end = self._end + value - self._start
+        self._check(self._channel, value, end)
+        self._start, self._end = value, end
+        self.writes.append((self.name, "frame_start"))
+
+    @property
+    def frame_final_start(self):
+        return self._start
+
+    @property
+    def frame_final_end(self):
+        return self._end
+
+    @frame_final_end.setter
+    def frame_final_end(self, value):
+        self._check(self._channel, self._start, value)
+        self._end = value
+        self.writes.append((self.name, "frame_final_end"))
+
+
+class RippleShiftTest(unittest.TestCase):
+
+    def test_shift_stops_at_locked_strip(self):
+        tl = timeline(
+            ("a", 1, 0, 10, False),
+            ("b", 1, 20, 30, False),
+            ("locked", 1, 40, 50, True),
+            ("d", 1, 60, 70, False),
+        )
+        ripple_shift(tl, {1: [(10, 20)]})
+        self.assertEqual(spans(tl), {
+            "a": (1, 0, 10),
+            "b": (1, 10, 20),
+            "locked": (1, 40, 50),
+            "d": (1, 60, 70),
+        })
+
+    def test_ranges_after_locked_strip_still_close(self):
+        tl = timeline(
+            ("locked", 1, 0, 10, True),
+            ("b", 1, 20, 30, False),
+            ("c", 1, 40, 50, False),
+        )
+        ripple_shift(tl, {1: [(10, 20), (30, 35)]})
+        self.assertEqual(spans(tl)["b"], (1, 10, 20))
+        self.assertEqual(spans(tl)["c"], (1, 25, 35))
+
+
+class CloseGapsTest(unittest.TestCase):
+
+    def effect(self, tl, name, channel, start, end):
+        # An effect reading from two strips on other channels.
+        strip = Strip(name, 'CROSS', channel, start, start, end, inputs=("x", "y"))
+        return Timeline(list(tl.strips.values()) + [strip])
+
+    def test_gap_is_closed(self):
+        tl = timeline(("a", 1, 0, 10, False), ("b", 1, 20, 30, False), ("c", 1, 30, 40, False))
+        self.assertEqual(close_gaps(tl, ["a", "b"]), ["a"])
+        self.assertEqual(spans(tl)["b"], (1, 10, 20))
+        self.assertEqual(spans(tl)["c"], (1, 20, 30))
+
+    def test_gap_holding_an_effect_stays_open(self):
+        tl = self.effect(timeline(("a", 1, 0, 10, False), ("b", 1, 26, 40, False)), "fx", 1, 20, 25)
+        self.assertEqual(close_gaps(tl, ["a"]), [])
+        self.assertEqual(spans(tl)["b"], (1, 26, 40))
+        self.assertEqual(spans(tl)["fx"], (1, 20, 25))
+
+    def test_strips_stop_in_front_of_effects(self):
+        tl = self.effect(timeline(
+            ("a", 1, 0, 10, False),
+            ("b", 1, 20, 30, False),
+            ("c", 1, 40, 50, False),
+        ), "fx", 1, 31, 35)
+        self.assertEqual(close_gaps(tl, ["a"]), ["a"])
+        self.assertEqual(spans(tl)["b"], (1, 10, 20))
+        self.assertEqual(spans(tl)["fx"], (1, 31, 35))
+        self.assertEqual(spans(tl)["c"], (1, 40, 50))
+
+    def test_gap_before_locked_strip_is_not_reported(self):
+        tl = timeline(("a", 1, 0, 10, False), ("locked", 1, 20, 30, True), ("b", 2, 20, 30, False))
+        self.assertEqual(close_gaps(tl, ["a", "b"]), [])
+        self.assertEqual(spans(tl)["locked"], (1, 20, 30))
+
+
+class DependentsTest(unittest.TestCase):
+
+    def test_effects_of_effects(self):
+        tl = timeline(("a", 1, 0, 10, False), ("b", 2, 0, 10, False))
+        tl = Timeline(list(tl.strips.values()) + [
+            Strip("fx", 'CROSS', 3, 0, 0, 10, inputs=("a", "b")),
+            Strip("glow", 'GLOW', 4, 0, 0, 10, inputs=("fx",)),
+        ])
+        self.assertEqual(tl.dependents_of(["a"]), {"fx", "glow"})
+        self.assertEqual(tl.dependents_of(["glow"]), set())
+
+        tl.remove(["a", "fx", "glow"])
+        self.assertEqual(tl.dependents_of(["b"]), set())
+        self.assertEqual(tl.changes(), [])
+
+
+class MoveStripsTest(unittest.TestCase):
+
+    def test_frame_move_is_shortened_by_blocking_strip(self):
+        tl = timeline(("a", 1, 0, 10, False), ("b", 1, 15, 25, False))
+        self.assertEqual(move_strips(tl, ["a"], frame_delta=10), (5, 0))
+        self.assertEqual(spans(tl)["a"], (1, 5, 15))
+
+    def test_frame_move_without_space(self):
+        tl = timeline(("a", 1, 0, 10, False), ("b", 1, 10, 20, False))
+        self.assertEqual(move_strips(tl, ["a"], frame_delta=3), (0, 0))
+        self.assertEqual(spans(tl)["a"], (1, 0, 10))
+
+    def test_strips_moving_together_dont_block_each_other(self):
+        tl = timeline(("a", 1, 0, 10, False), ("b", 1, 10, 20, False))
+        self.assertEqual(move_strips(tl, ["a", "b"], frame_delta=4), (4, 0))
+        self.assertEqual(spans(tl), {"a": (1, 4, 14), "b": (1, 14, 24)})
+
+    def test_channel_move_skips_occupied_channels(self):
+        tl = timeline(
+            ("a", 1, 0, 10, False),
+            ("blocker", 2, 5, 15, False),
+            ("other", 3, 10, 20, False),
+        )
+        self.assertEqual(move_strips(tl, ["a"], channel_delta=1), (0, 2))
+        self.assertEqual(spans(tl)["a"], (3, 0, 10))
+
+    def test_channel_move_out_of_range(self):
+        tl = timeline(("a", 32, 0, 10, False))
+        self.assertEqual(move_strips(tl, ["a"], channel_delta=1), (0, 0))
+        tl = timeline(("a", 2, 0, 10, False), ("blocker", 1, 0, 10, False))
+        self.assertEqual(move_strips(tl, ["a"], channel_delta=-1), (0, 0))
+
+
+class ExtendToFillTest(unittest.TestCase):
+
+    def test_extend_to_next_strip_or_end_frame(self):
+        tl = timeline(
+            ("a", 1, 0, 10, False),
+            ("b", 1, 20, 30, False),
+            ("locked", 2, 0, 10, True),
+            ("full", 3, 0, 50, False),
+        )
+        extended, failed = extend_to_fill(tl, ["a", "b", "locked", "full"], 50)
+        self.assertEqual(extended, ["a", "b"])
+        self.assertEqual(failed, ["full"])
+        self.assertEqual(spans(tl)["a"], (1, 0, 20))
+        self.assertEqual(spans(tl)["b"], (1, 20, 50))
+        self.assertEqual(spans(tl)["locked"], (2, 0, 10))
+
+    def test_strip_past_end_frame_keeps_its_end(self):
+        tl = timeline(("a", 1, 0, 80, False))
+        self.assertEqual(extend_to_fill(tl, ["a"], 50), ([], ["a"]))
+
+
+class EditPointDistanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tl = timeline(
+            ("a", 1, 0, 10, False),
+            ("b", 2, 15, 30, False),
+            ("c", 3, 40, 50, False),
+        )
+
+    def test_forward(self):
+        # The end of a reaches the start of b first.
+        self.assertEqual(edit_point_distance(self.tl, ["a"], True), 5)
+
+    def test_backward(self):
+        # The start of c reaches the end of b first.
+        self.assertEqual(edit_point_distance(self.tl, ["c"], False), 10)
+
+    def test_no_edit_point(self):
+        self.assertEqual(edit_point_distance(self.tl, ["c"], True), 0)
+
+
+class ApplyTest(unittest.TestCase):
+
+    def sequences(self, *strips):
+        store = {}
+        for name, channel, start, end in strips:
+            FakeSequence(store, name, channel, start, end)
+        return store, Timeline.from_sequences(store["sequences"])
+
+    def test_left_moves_are_written_front_first(self):
+        store, tl = self.sequences(("a", 1, 10, 20), ("b", 1, 20, 30))
+        ripple_shift(tl, {1: [(0, 10)]})
+        self.assertEqual(tl.apply(), 2)
+        self.assertEqual(store["writes"], [("a", "frame_start"), ("b", "frame_start")])
+        self.assertEqual([(s.frame_start, s.frame_final_end) for s in store["sequences"]], [(0, 10), (10, 20)])
+
+    def test_right_moves_are_written_back_first(self):
+        store, tl = self.sequences(("a", 1, 0, 10), ("b", 1, 10, 20))
+        move_strips(tl, ["a", "b"], frame_delta=5)
+        tl.apply()
+        self.assertEqual(store["writes"], [("b", "frame_start"), ("a", "frame_start")])
+
+    def test_channel_moves_up_are_written_top_first(self):
+        store, tl = self.sequences(("low", 1, 0, 10), ("high", 2, 0, 10))
+        self.assertEqual(move_strips(tl, ["low", "high"], channel_delta=1), (0, 1))
+        tl.apply()
+        self.assertEqual(store["writes"], [("high", "channel"), ("low", "channel")])
+
+    def test_channel_moves_down_are_written_bottom_first(self):
+        store, tl = self.sequences(("low", 2, 0, 10), ("high", 3, 0, 10))
+        self.assertEqual(move_strips(tl, ["low", "high"], channel_delta=-1), (0, -1))
+        tl.apply()
+        self.assertEqual(store["writes"], [("low", "channel"), ("high", "channel")])
+
+    def test_unchanged_strips_are_not_written(self):
+        store, tl = self.sequences(("a", 1, 0, 10), ("b", 2, 0, 10))
+        move_strips(tl, ["a"], frame_delta=5)
+        self.assertEqual(tl.apply(), 1)
+        self.assertEqual(store["writes"], [("a", "frame_start")])
+        self.assertEqual(tl.apply(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()